@@ -3,5 +3,12 @@
 from .mapper.mapper import map_model as map_model
 from .table_writer.table_writer import cdm_to_ascii as cdm_to_ascii
 from .table_writer.table_writer import table_to_ascii as table_to_ascii
+from .table_writer.parquet_writer import cdm_to_parquet as cdm_to_parquet
+from .table_writer.sql_writer import cdm_to_sql as cdm_to_sql
+from .table_writer.partition_writer import cdm_to_partitions as cdm_to_partitions
 from .table_reader.table_reader import read_tables as read_tables
+from .table_reader.table_reader import read_observations as read_observations
+from .table_reader.table_reader import read_reports as read_reports
+from .table_reader.table_reader import read_station as read_station
+from .table_reader.table_reader import index_tables as index_tables
 from .gridded_stats import gridded_stats
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module with functions to handle CDM array elements (int[], varchar[]...).
+
+Array elements are kept in the tables as python lists (or tuples), shared by
+all rows with the same value, e.g. a replicated default or a mapping from a
+code. They are printed to the CDM ``{a,b,c}`` text per unique value, never per
+row. Columns backed by Arrow list arrays (pandas.ArrowDtype) are printed from
+their offsets and values with Arrow compute kernels.
+
+Values already in string form (python list representation or CDM text) are
+also supported.
+"""
+
+import ast
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+
+def to_list(value):
+    """
+    Gets the list of values of an array element
+
+    Parameters
+    ----------
+    value: list, tuple, np.array, string (python representation or CDM text) or scalar
+
+    Returns
+    -------
+    list: list of values
+    """
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('{') and value.endswith('}'):
+            return value[1:-1].split(',')
+        value = ast.literal_eval(value)
+        return list(value) if isinstance(value, (list, tuple)) else [value]
+    return [value]
+
+
+def array_values(value, data_type):
+    """
+    Gets the list of values of an array element, as printed to CDM text:
+    missing and empty values are dropped, an empty array is a missing value
+
+    Parameters
+    ----------
+    value: array element (list, CDM text...)
+    data_type: CDM data type of the array values
+
+    Returns
+    -------
+    list, None if empty
+    """
+    values = to_list(value)
+    if data_type == 'int':
+        values = [float(x) for x in values]
+        values = [int(x) for x in values if np.isfinite(x)]
+    elif data_type == 'numeric':
+        values = [float(x) for x in values]
+        values = [x for x in values if np.isfinite(x)]
+    else:
+        values = [str(x) for x in values if x]
+    return values if len(values) > 0 else None
+
+
+def factorize(data):
+    """
+    Encodes an array column as codes to its unique values
+
+    Hashable values (strings, tuples) are encoded by value, lists by identity,
+    so that all rows sharing the same list object share the same code.
+
+    Parameters
+    ----------
+    data: pd.Series or np.array of array elements
+
+    Returns
+    -------
+    codes: np.array of int, -1 for missing values
+    uniques: list with the unique values
+    """
+    values = np.asarray(data, dtype=object)
+    mask = np.asarray(pd.isna(values), dtype=bool) if len(values) > 0 else np.zeros(0, dtype=bool)
+    codes = np.full(len(values), -1, dtype='int64')
+    notna = values[~mask]
+    if len(notna) == 0:
+        return codes, []
+    try:
+        notna_codes, _ = pd.factorize(notna)
+    except TypeError:
+        ids = np.fromiter(map(id, notna), dtype=np.uintp, count=len(notna))
+        notna_codes, _ = pd.factorize(ids)
+    # Index of the first occurrence of each code (codes are 0..n-1, so sorted uniques are all the codes)
+    _, first = np.unique(notna_codes, return_index=True)
+    codes[~mask] = notna_codes
+    return codes, list(notna[first])
+
+
+def is_arrow_list(data):
+    """
+    Checks if a pd.Series is backed by an Arrow list array
+
+    Parameters
+    ----------
+    data: pd.Series
+
+    Returns
+    -------
+    bool
+    """
+    dtype = getattr(data, 'dtype', None)
+    return pa is not None and hasattr(pd, 'ArrowDtype') and isinstance(dtype, pd.ArrowDtype) and \
+        pa.types.is_list(dtype.pyarrow_dtype)
+
+
+def print_arrow_array(data, null_label):
+    """
+    Prints an Arrow list array backed pd.Series to CDM array text from its offsets and values.
+    Missing and empty values within the lists are skipped.
+
+    Parameters
+    ----------
+    data: pd.Series with pandas.ArrowDtype(list)
+    null_label: specified how nan are represented
+
+    Returns
+    -------
+    data: pd.Series of CDM array strings
+    """
+    arr = data.array.__arrow_array__()
+    arr = arr.combine_chunks() if isinstance(arr, pa.ChunkedArray) else arr
+    values = pc.list_flatten(arr)
+    parents = pc.list_parent_indices(arr)
+    keep = values.is_valid()
+    if pa.types.is_floating(values.type):
+        keep = pc.and_(keep, pc.is_finite(values))
+        values = pc.cast(values, pa.int64(), safe=False)
+    values = pc.cast(values, pa.string())
+    keep = pc.and_(pc.fill_null(keep, False), pc.fill_null(pc.greater(pc.utf8_length(values), 0), False))
+    values = values.filter(keep)
+    counts = np.bincount(parents.filter(keep).to_numpy(), minlength=len(arr))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype('int32')
+    joined = pc.binary_join(pa.ListArray.from_arrays(pa.array(offsets), values), ',')
+    printed = pc.binary_join_element_wise('{', joined, '}', '')
+    valid = pc.and_(pc.fill_null(arr.is_valid(), False), pa.array(counts > 0))
+    printed = pc.if_else(valid, printed, pa.scalar(null_label, pa.string()))
+    return pd.Series(printed.to_numpy(zero_copy_only=False), index=data.index, dtype='object')
+
+
+def print_array(data, printer_i, null_label):
+    """
+    Prints an array column to CDM array text, formatting each unique value once
+
+    Parameters
+    ----------
+    data: pd.Series of array elements
+    printer_i: function printing a single array element
+    null_label: specified how nan are represented
+
+    Returns
+    -------
+    data: pd.Series of CDM array strings
+    """
+    if is_arrow_list(data):
+        return print_arrow_array(data, null_label)
+    codes, uniques = factorize(data)
+    # Last item is for code -1, missing values
+    printed = np.array([printer_i(x, null_label=null_label) for x in uniques] + [null_label], dtype=object)
+    return pd.Series(printed[codes], index=data.index, dtype='object')
+
+
+def from_text(data, data_type):
+    """
+    Parses array elements printed as CDM text ({a,b,c}) to lists,
+    each distinct text once: rows with the same text share the same list
+
+    Parameters
+    ----------
+    data: pd.Series with the array elements as text, missing values as NaN
+    data_type: CDM data type of the array values
+
+    Returns
+    -------
+    pd.Series of lists, None for missing values
+    """
+    codes, uniques = pd.factorize(data)
+    lists = np.empty(len(uniques) + 1, dtype=object)
+    for i, value in enumerate(uniques):
+        lists[i] = array_values(value, data_type)
+    lists[-1] = None
+    return pd.Series(lists[codes], index=data.index, name=data.name)
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module to convert CDM tables to Apache Arrow, with the CDM table definitions
+(lib/tables/*.json) as schema.
+
+CDM data types map to Arrow types as:
+    - int: int32
+    - numeric: float64
+    - varchar: string
+    - timestamp with timezone: timestamp[us, tz=UTC]
+    - <type>[]: list of <type>
+
+The element attributes (data_type, decimal_places...) are stored as field
+metadata, with their values json encoded.
+
+Delimited files (psv) can also be read with the multithreaded Arrow CSV reader (read_csv).
+
+Requires pyarrow.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+from cdm.common import arrays_hdlr
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+# Elements that identify records: unique values, not worth dictionary encoding
+unique_elements = ['report_id', 'observation_id']
+
+
+def arrow_type(data_type):
+    """
+    Gets the Arrow type of a CDM data type
+
+    Parameters
+    ----------
+    data_type: CDM (pseudo-sql) data type
+
+    Returns
+    -------
+    pyarrow.DataType, None if not supported
+    """
+    if data_type and data_type.endswith('[]'):
+        value_type = arrow_type(data_type[:-2])
+        return pa.list_(value_type) if value_type else None
+    return {'int': pa.int32(), 'numeric': pa.float64(), 'varchar': pa.string(),
+            'timestamp with timezone': pa.timestamp('us', tz='UTC')}.get(data_type)
+
+
+def field_metadata(atts):
+    """
+    Encodes the attributes of an element as Arrow field metadata
+
+    Parameters
+    ----------
+    atts: dictionary with the element attributes
+
+    Returns
+    -------
+    dict: {attribute: json encoded value}
+    """
+    return {k: json.dumps(v) for k, v in atts.items() if v is not None}
+
+
+def cdm_schema(table_atts, columns=None):
+    """
+    Gets the Arrow schema of a CDM table
+
+    Parameters
+    ----------
+    table_atts: attributes of the table stored as a python dictionary,
+        as in the cdm tables output by the mapper
+    columns: list of elements to include, defaults to all the table elements
+
+    Returns
+    -------
+    pyarrow.Schema
+    """
+    columns = list(table_atts.keys()) if columns is None else columns
+    return pa.schema([pa.field(x, arrow_type(table_atts.get(x).get('data_type')), nullable=True,
+                               metadata=field_metadata(table_atts.get(x))) for x in columns])
+
+
+def dictionary_columns(table_atts, columns=None):
+    """
+    Gets the elements of a table that are worth dictionary encoding:
+    code (int) and text elements, but the record identifiers.
+
+    Parameters
+    ----------
+    table_atts: attributes of the table stored as a python dictionary
+    columns: list of elements to include, defaults to all the table elements
+
+    Returns
+    -------
+    list: elements
+    """
+    columns = list(table_atts.keys()) if columns is None else columns
+    return [x for x in columns if x not in unique_elements and
+            table_atts.get(x).get('data_type') in ['int', 'varchar', 'int[]', 'varchar[]']]
+
+
+def to_arrow_array(data, data_type):
+    """
+    Converts a CDM element to an Arrow array
+
+    Parameters
+    ----------
+    data: pd.Series with the element values
+    data_type: CDM data type of the element
+
+    Returns
+    -------
+    pyarrow.Array
+    """
+    atype = arrow_type(data_type)
+    if is_arrow_backed(data):
+        # Already Arrow: no conversion if the type is the CDM one
+        values = data.array.__arrow_array__()
+        values = values.combine_chunks() if isinstance(values, pa.ChunkedArray) else values
+        return values if values.type == atype else values.cast(atype)
+    notna = data.notna().to_numpy()
+    if data_type == 'int':
+        values = pd.to_numeric(data, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        notna = notna & np.isfinite(values)
+        return pa.array(np.where(notna, values, 0).astype('int64'), mask=~notna).cast(atype)
+    elif data_type == 'numeric':
+        values = pd.to_numeric(data, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        return pa.array(values, mask=np.isnan(values), type=atype)
+    elif data_type == 'varchar':
+        values = np.full(len(data), None, dtype=object)
+        values[notna] = data[notna].astype(str).to_numpy()
+        return pa.array(values, type=atype)
+    elif data_type == 'timestamp with timezone':
+        values = pd.to_datetime(data, errors='coerce')
+        values = values.dt.tz_localize('UTC') if values.dt.tz is None else values.dt.tz_convert('UTC')
+        return pa.array(values, type=atype, from_pandas=True)
+    elif data_type.endswith('[]'):
+        # Each distinct array is converted once
+        codes, uniques = arrays_hdlr.factorize(data)
+        uniques = pa.array([arrays_hdlr.array_values(x, data_type[:-2]) for x in uniques], type=atype)
+        return uniques.take(pa.array(codes, mask=codes < 0))
+
+
+def to_arrow_table(table, table_atts, columns=None):
+    """
+    Converts a CDM table to an Arrow table with the CDM schema
+
+    Parameters
+    ----------
+    table: pandas.DataFrame with the CDM table
+    table_atts: attributes of the table stored as a python dictionary
+    columns: list of elements to include, defaults to all the table elements.
+        Elements not in the table are all null.
+
+    Returns
+    -------
+    pyarrow.Table
+    """
+    schema = cdm_schema(table_atts, columns)
+    arrays = []
+    for field in schema:
+        if isinstance(table, pa.Table) and field.name in table.column_names:
+            values = table.column(field.name)
+            arrays.append(values if values.type == field.type else values.cast(field.type))
+        elif not isinstance(table, pa.Table) and field.name in table:
+            arrays.append(to_arrow_array(table[field.name], table_atts.get(field.name).get('data_type')))
+        else:
+            arrays.append(pa.nulls(len(table), type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def is_table(data):
+    """
+    Checks if data is a single table: a pandas.DataFrame or a pyarrow.Table
+
+    Parameters
+    ----------
+    data: object to check
+
+    Returns
+    -------
+    bool
+    """
+    return isinstance(data, pd.DataFrame) or (pa is not None and isinstance(data, pa.Table))
+
+
+def is_arrow_backed(data):
+    """
+    Checks if a pd.Series is backed by an Arrow array (pandas.ArrowDtype)
+
+    Parameters
+    ----------
+    data: pd.Series
+
+    Returns
+    -------
+    bool
+    """
+    return pa is not None and hasattr(pd, 'ArrowDtype') and isinstance(getattr(data, 'dtype', None), pd.ArrowDtype)
+
+
+def to_arrow_frame(table, table_atts):
+    """
+    Converts a CDM table to a pandas.DataFrame backed by Arrow arrays with the CDM schema
+
+    Parameters
+    ----------
+    table: pandas.DataFrame or pyarrow.Table with the CDM table
+    table_atts: attributes of the table stored as a python dictionary
+
+    Returns
+    -------
+    pandas.DataFrame with pandas.ArrowDtype columns
+    """
+    columns = table.column_names if isinstance(table, pa.Table) else list(table.columns)
+    return to_arrow_table(table, table_atts, columns).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def to_pandas(table):
+    """
+    Converts Arrow tables, and the Arrow backed columns of pandas.DataFrames, to numpy backed
+    pandas columns. Timestamps with timezone are converted to UTC naive datetimes, as the
+    mapper outputs them. Arrays (list columns) are kept Arrow backed. Pandas data is not modified.
+
+    Parameters
+    ----------
+    table: pandas.DataFrame or pyarrow.Table
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if pa is None:
+        return table
+    if isinstance(table, pa.Table):
+        arrays = {name: table.column(name) for name in table.column_names}
+    else:
+        arrays = {name: table[name].array.__arrow_array__() for name in table.columns
+                  if is_arrow_backed(table[name]) and not pa.types.is_list(table[name].dtype.pyarrow_dtype)}
+        if len(arrays) == 0:
+            return table
+    columns = {}
+    for name, values in arrays.items():
+        if pa.types.is_timestamp(values.type) and values.type.tz is not None:
+            values = values.cast(pa.timestamp(values.type.unit))
+        if pa.types.is_list(values.type):
+            # Arrays are kept in Arrow, they are printed from their offsets and values
+            columns[name] = pd.Series(pd.arrays.ArrowExtensionArray(values))
+        else:
+            columns[name] = values.to_pandas()
+    if isinstance(table, pa.Table):
+        return pd.DataFrame(columns)
+    return table.assign(**{name: values.to_numpy() for name, values in columns.items()})
+
+
+def csv_type(dtype):
+    """
+    Gets the Arrow type a column is parsed to, for a pandas dtype (None to infer it)
+    """
+    if dtype is None:
+        return None
+    if dtype in ['object', 'category', object, 'str', str]:
+        return pa.string()
+    if dtype == 'Int32':
+        return pa.int32()
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def file_columns(file_path, delimiter='|', usecols=None):
+    """
+    Gets the columns of a delimited file to read, in the order of the file
+
+    Parameters
+    ----------
+    file_path: path to the file
+    delimiter: default is '|'
+    usecols: list of the columns to read, default is None (all)
+
+    Returns
+    -------
+    list: columns. Raises ValueError if a column in usecols is not in the file
+    """
+    columns = list(pd.read_csv(file_path, delimiter=delimiter, nrows=0).columns)
+    if usecols is not None:
+        columns = [x for x in columns if x in usecols]
+        if len(columns) != len(set(usecols)):
+            raise ValueError('Columns not in file: {}'.format(",".join(x for x in usecols if x not in columns)))
+    return columns
+
+
+def csv_to_pandas(table, dtypes):
+    """
+    Converts an Arrow table read from a delimited file to a pandas.DataFrame with the dtypes given,
+    as pandas.read_csv reads it: text columns as objects with NaN missing values, or as categorical
+
+    Parameters
+    ----------
+    table: pyarrow.Table
+    dtypes: dictionary with the {column: dtype}, None to keep the type read
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    for i, x in enumerate(table.column_names):
+        arrow_dtype = csv_type(dtypes.get(x))
+        if arrow_dtype is not None and table.column(i).type != arrow_dtype:
+            table = table.set_column(i, x, table.column(i).cast(arrow_dtype))
+    df = table.to_pandas(types_mapper={pa.int32(): pd.Int32Dtype()}.get if 'Int32' in dtypes.values() else None)
+    for x in table.column_names:
+        if dtypes.get(x) == 'category':
+            df[x] = df[x].astype('category')
+        elif pa.types.is_string(table.schema.field(x).type) and table.column(x).null_count > 0:
+            # Missing values as NaN, as pandas reads them
+            values = df[x].to_numpy(copy=True)
+            values[table.column(x).is_null().to_numpy(zero_copy_only=False)] = np.nan
+            df[x] = values
+    return df
+
+
+def read_csv_table(file_path, delimiter='|', columns=None, column_types=None, na_values=None, use_threads=True):
+    """
+    Reads a delimited file to an Arrow table, with the Arrow CSV reader
+
+    Parameters
+    ----------
+    file_path: path to the file
+    delimiter: default is '|'
+    columns: list of the columns to read, default is None (all)
+    column_types: dictionary with the {column: pyarrow.DataType}, the type of the others is inferred
+    na_values: list of the missing values labels, None for the default missing values of Arrow
+    use_threads: if True (default) the file is parsed by multiple threads
+
+    Returns
+    -------
+    pyarrow.Table
+    """
+    convert_kwargs = {} if na_values is None else {'null_values': list(na_values)}
+    return pa_csv.read_csv(file_path, read_options=pa_csv.ReadOptions(use_threads=use_threads),
+                           parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+                           convert_options=pa_csv.ConvertOptions(
+                               include_columns=columns, strings_can_be_null=True,
+                               column_types=column_types or {}, **convert_kwargs))
+
+
+def read_csv(file_path, delimiter='|', usecols=None, dtype='object', na_values=None, use_threads=True):
+    """
+    Reads a delimited file with the Arrow CSV reader, parsing blocks of the file with
+    multiple threads, as pandas.read_csv(keep_default_na=False) does: the columns in usecols,
+    in the order of the file, with the dtypes given, and the values in na_values as missing
+    values (None for the default missing values of Arrow). Compressed files are decompressed.
+
+    Parameters
+    ----------
+    file_path: path to the file
+    delimiter: default is '|'
+    usecols: list of the columns to read, default is None (all)
+    dtype: dtype of all the columns ('object', default) or dictionary with the {column: dtype}, the dtype
+        of the columns not in it is inferred. Text columns are read as objects, with NaN missing values,
+        or as categorical
+    na_values: list of the missing values labels
+    use_threads: if True (default) the file is parsed by multiple threads
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    columns = file_columns(file_path, delimiter=delimiter, usecols=usecols)
+    dtypes = {x: dtype.get(x) if isinstance(dtype, dict) else dtype for x in columns}
+    column_types = {x: csv_type(dtypes.get(x)) for x in columns if dtypes.get(x) is not None}
+    table = read_csv_table(file_path, delimiter=delimiter, columns=columns, column_types=column_types,
+                           na_values=na_values, use_threads=use_threads)
+    return csv_to_pandas(table, dtypes)
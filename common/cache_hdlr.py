@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module to cache the table files (psv) in columnar Apache Arrow IPC (Feather V2) files,
+read memory-mapped instead of parsing the text files again.
+
+The cache of a file keeps its fields as text, as written, so that it can be read with any
+set of columns, dtypes and missing values labels. It is written, uncompressed:
+
+    - next to the file, as <file name>.arrow (cache=True)
+    - or in a cache directory, as <file name>-<hash of the file path>.arrow (cache=<directory>)
+
+The cache is built the first time a file is read, and is valid while the file does not change:
+the size, modification time and a hash of the first and last blocks of the file are stored in
+the cache metadata and checked at every read. Caches no longer valid are built again.
+
+Requires pyarrow.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from cdm.common import arrow_hdlr
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pc = None
+    pa_csv = None
+
+cache_extension = '.arrow'
+# Size of the blocks of the file hashed, at its start and end
+hash_block = 1 << 20
+metadata_key = b'cdm_cache'
+
+
+def cache_path(file_path, cache=True):
+    """
+    Gets the path of the cache of a file
+
+    Parameters
+    ----------
+    file_path: path to the file
+    cache: True to cache the file next to it, or path to a cache directory
+
+    Returns
+    -------
+    str: path of the cache
+    """
+    if cache is True:
+        return file_path + cache_extension
+    key = hashlib.md5(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache, '{0}-{1}{2}'.format(os.path.basename(file_path), key, cache_extension))
+
+
+def source_signature(file_path):
+    """
+    Gets the signature of a file, to validate its cache: size, modification time
+    and md5 hash of the first and last blocks
+
+    Returns
+    -------
+    dict: {'size', 'mtime', 'hash'}
+    """
+    stat = os.stat(file_path)
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as fileObj:
+        md5.update(fileObj.read(hash_block))
+        if stat.st_size > hash_block:
+            fileObj.seek(max(hash_block, stat.st_size - hash_block))
+            md5.update(fileObj.read(hash_block))
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': md5.hexdigest()}
+
+
+def cache_metadata(path):
+    """
+    Reads the metadata of a cache
+
+    Returns
+    -------
+    dict: {'source': signature of the file cached, 'delimiter'}, None if there is no valid cache
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        metadata = pa.ipc.open_file(pa.memory_map(path)).schema.metadata or {}
+        return json.loads(metadata.get(metadata_key).decode('utf-8'))
+    except Exception:
+        return None
+
+
+def write_cache(file_path, path, delimiter='|'):
+    """
+    Writes the cache of a file, parsing it in blocks with the Arrow CSV reader. All the fields
+    are kept as text, with no missing values. The cache is written to a temporary file, moved
+    to its path when complete
+
+    Parameters
+    ----------
+    file_path: path to the file
+    path: path of the cache, see cache_path
+    delimiter: default is '|'
+    """
+    signature = source_signature(file_path)
+    columns = arrow_hdlr.file_columns(file_path, delimiter=delimiter)
+    reader = pa_csv.open_csv(file_path, parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+                             convert_options=pa_csv.ConvertOptions(
+                                 column_types={x: pa.string() for x in columns},
+                                 null_values=[], strings_can_be_null=False))
+    schema = reader.schema.with_metadata({metadata_key: json.dumps({'source': signature, 'delimiter': delimiter})})
+    tmp_path = '{0}.{1}-{2}.tmp'.format(path, os.getpid(), threading.get_ident())
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_cache(file_path, cache=True, delimiter='|', usecols=None, dtype='object', na_values=None):
+    """
+    Reads a file from its cache, memory-mapped, as arrow_hdlr.read_csv reads the file.
+    The cache is built first if there is none, or if it is not valid
+
+    Parameters
+    ----------
+    file_path: path to the file
+    cache: True to cache the file next to it, or path to a cache directory
+    delimiter: default is '|'
+    usecols: list of the columns to read, default is None (all)
+    dtype: dtype of all the columns ('object', default) or dictionary with the {column: dtype}, see
+        arrow_hdlr.read_csv. The dtype of the columns not in it is that of the text, as cached
+    na_values: list of the missing values labels, None for the default missing values of Arrow
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    path = cache_path(file_path, cache)
+    metadata = cache_metadata(path)
+    if (metadata is None or metadata.get('delimiter') != delimiter
+            or metadata.get('source') != source_signature(file_path)):
+        if cache is not True:
+            os.makedirs(cache, exist_ok=True)
+        write_cache(file_path, path, delimiter=delimiter)
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    columns = table.column_names
+    if usecols is not None:
+        columns = [x for x in columns if x in usecols]
+        if len(columns) != len(set(usecols)):
+            raise ValueError('Columns not in file: {}'.format(",".join(x for x in usecols if x not in columns)))
+    table = table.select(columns)
+    na_values = pa_csv.ConvertOptions().null_values if na_values is None else list(na_values)
+    if na_values:
+        value_set = pa.array(na_values, type=pa.string())
+        for i, x in enumerate(columns):
+            column = table.column(i)
+            table = table.set_column(i, x, pc.if_else(pc.is_in(column, value_set=value_set), None, column))
+    dtypes = {x: dtype.get(x) if isinstance(dtype, dict) else dtype for x in columns}
+    return arrow_hdlr.csv_to_pandas(table, dtypes)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module to write compressed text files with block-parallel, multithreaded compression.
+
+Text is streamed to a buffer that is compressed in blocks by a pool of threads
+(zlib, bz2 and zstandard release the GIL), and the compressed blocks are written
+in order to the file as independent gzip members, bzip2 streams or zstd frames.
+Concatenations of these are valid gzip, bzip2 and zstd files, readable by the
+standard tools and by pandas.read_csv.
+
+zstd compression requires the zstandard package.
+"""
+
+import os
+import gzip
+import bz2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression: file extension
+compressions = {'gzip': '.gz', 'bz2': '.bz2', 'zstd': '.zst'}
+
+default_block_size = 1 << 22
+
+
+def compress_block(data, compression, level=None):
+    """
+    Compresses a block of bytes to an independent gzip member, bzip2 stream or zstd frame
+
+    Parameters
+    ----------
+    data: bytes to compress
+    compression: one of ``compressions``
+    level: compression level, defaults to the library default
+
+    Returns
+    -------
+    bytes: the compressed block
+    """
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=6 if level is None else level)
+    elif compression == 'bz2':
+        return bz2.compress(data, compresslevel=9 if level is None else level)
+    elif compression == 'zstd':
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+def check_compression(compression):
+    """
+    Checks that a compression is supported
+
+    Parameters
+    ----------
+    compression: compression name
+
+    Returns
+    -------
+    str: error message, None if supported
+    """
+    if compression not in compressions:
+        return 'Compression {0} not supported, supported are {1}'.format(compression, ",".join(compressions.keys()))
+    if compression == 'zstd' and zstandard is None:
+        return 'zstd compression requires the zstandard package'
+    return None
+
+
+class block_compressor():
+    """
+    Text file-like object that compresses what is written to it in parallel blocks.
+
+    Parameters
+    ----------
+    filename: file to write to
+    compression: one of ``compressions``
+    mode: 'w' to overwrite the file, 'a' to append to it
+    threads: number of compression threads, defaults to the number of CPUs
+    block_size: size in bytes of the uncompressed blocks
+    level: compression level
+    encoding: text encoding
+    """
+
+    def __init__(self, filename, compression, mode='w', threads=None, block_size=default_block_size, level=None,
+                 encoding='utf-8'):
+        self.compression = compression
+        self.block_size = block_size
+        self.level = level
+        self.encoding = encoding
+        self.threads = threads if threads else os.cpu_count() or 1
+        self.file = open(filename, mode.replace('b', '') + 'b')
+        self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        self.pending = deque()
+        self.buffer = []
+        self.buffered = 0
+
+    def write(self, text):
+        data = text.encode(self.encoding) if isinstance(text, str) else text
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.block_size:
+            self.submit()
+        return len(text)
+
+    def submit(self):
+        if self.buffered > 0:
+            block = b''.join(self.buffer)
+            self.buffer = []
+            self.buffered = 0
+            self.pending.append(self.executor.submit(compress_block, block, self.compression, self.level))
+        # Keep the threads busy, but not too many blocks in memory
+        while len(self.pending) > 2 * self.threads:
+            self.file.write(self.pending.popleft().result())
+
+    def flush(self):
+        pass
+
+    def close(self):
+        try:
+            self.submit()
+            while self.pending:
+                self.file.write(self.pending.popleft().result())
+        finally:
+            self.executor.shutdown()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
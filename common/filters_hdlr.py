@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module to filter the records of CDM tables with predicates on their elements.
+
+Filters are lists of (element, operator, value) tuples, all of which have to be
+met by a record (and):
+
+    - element: name of an element, applied to all the tables with it,
+        or (table, element) to apply it to a single table
+    - operator: '==', '!=', '<', '<=', '>', '>=', 'in', 'not in' or 'between'
+        (value is a list for 'in' and 'not in', a (low, high) pair for 'between', both included)
+
+e.g. [('date_time', '>=', '1950-01-01'), ('latitude', 'between', (-10, 10)), ('quality_flag', 'in', [0])]
+
+Values are compared with the element values converted to their CDM data type
+(numbers, timestamps or text). Missing values never meet a filter.
+
+Filters on time elements (report_timestamp, date_time) and on partition keys
+are also used to select the partitions to read (see common/partitions_hdlr.py).
+"""
+
+import pandas as pd
+from cdm.common import partitions_hdlr
+
+operators = ['==', '!=', '<', '<=', '>', '>=', 'in', 'not in', 'between']
+
+
+def check_filters(filters):
+    """
+    Checks that filters are well formed
+
+    Parameters
+    ----------
+    filters: list of (element, operator, value) tuples
+
+    Returns
+    -------
+    str: error message, None if well formed
+    """
+    if not isinstance(filters, (list, tuple)):
+        return 'Filters have to be a list of (element, operator, value) tuples'
+    for ifilter in filters:
+        if not isinstance(ifilter, (list, tuple)) or len(ifilter) != 3:
+            return 'Filter {} is not an (element, operator, value) tuple'.format(ifilter)
+        if ifilter[1] not in operators:
+            return 'Filter operator {0} not supported, supported are {1}'.format(ifilter[1], ",".join(operators))
+        if ifilter[1] == 'between' and (not isinstance(ifilter[2], (list, tuple)) or len(ifilter[2]) != 2):
+            return 'Filter {} with between needs a (low, high) value'.format(ifilter)
+    return None
+
+
+def table_filters(filters, table, table_atts):
+    """
+    Gets the filters applied to a table
+
+    Parameters
+    ----------
+    filters: list of (element, operator, value) tuples
+    table: table name
+    table_atts: attributes of the table, as in lib/tables/*.json
+
+    Returns
+    -------
+    list: (element, operator, value) filters of the table elements
+    """
+    ifilters = []
+    for element, operator, value in (filters or []):
+        if isinstance(element, (list, tuple)):
+            if element[0] != table:
+                continue
+            element = element[1]
+        if element in table_atts:
+            ifilters.append((element, operator, value))
+    return ifilters
+
+
+def typed_values(data, data_type):
+    """
+    Converts element values to their CDM data type, to compare them
+
+    Parameters
+    ----------
+    data: pd.Series or list of values
+    data_type: CDM data type of the element
+
+    Returns
+    -------
+    pd.Series
+    """
+    data = pd.Series(data)
+    if data_type in ['int', 'numeric']:
+        return pd.to_numeric(data.astype(object), errors='coerce')
+    if data_type == 'timestamp with timezone':
+        return pd.to_datetime(data.astype(object), errors='coerce', utc=True).dt.tz_localize(None)
+    return data.astype(object).where(data.notna(), None)
+
+
+def filter_mask(df, filters, table_atts):
+    """
+    Gets the records of a table that meet the filters
+
+    Parameters
+    ----------
+    df: pandas.Dataframe with the table records
+    filters: list of (element, operator, value) filters of the table, see table_filters
+    table_atts: attributes of the table, as in lib/tables/*.json
+
+    Returns
+    -------
+    np.array of bool
+    """
+    mask = pd.Series(True, index=df.index)
+    for element, operator, value in filters:
+        data_type = table_atts.get(element).get('data_type')
+        values = typed_values(df[element], data_type)
+        values.index = df.index
+        notna = values.notna()
+        if operator in ['in', 'not in']:
+            ivalues = typed_values(list(value), data_type)
+            imask = values.isin(ivalues.dropna().tolist())
+            imask = imask if operator == 'in' else ~imask & notna
+        elif operator == 'between':
+            low, high = typed_values(list(value), data_type).tolist()
+            imask = (values >= low) & (values <= high)
+        else:
+            ivalue = typed_values([value], data_type).iloc[0]
+            imask = {'==': values.__eq__, '!=': values.__ne__, '<': values.__lt__, '<=': values.__le__,
+                     '>': values.__gt__, '>=': values.__ge__}.get(operator)(ivalue)
+            imask = imask & notna
+        mask &= imask.fillna(False).astype(bool)
+    return mask.to_numpy()
+
+
+def partition_interval(keys):
+    """
+    Gets the time interval of a partition, from its year and month keys
+
+    Parameters
+    ----------
+    keys: dictionary with the {key: label} of the partition
+
+    Returns
+    -------
+    (start, end) pd.Timestamp, end excluded. None if the partition has no year
+    """
+    year = keys.get('year')
+    if year is None or year == partitions_hdlr.default_partition:
+        return None
+    month = keys.get('month')
+    if month is None or month == partitions_hdlr.default_partition:
+        start = pd.Timestamp(year=int(year), month=1, day=1)
+        return start, start + pd.DateOffset(years=1)
+    start = pd.Timestamp(year=int(year), month=int(month), day=1)
+    return start, start + pd.DateOffset(months=1)
+
+
+def interval_meets(interval, operator, value):
+    """
+    Checks if any time in an interval [start, end) can meet a filter
+    """
+    start, end = interval
+    if operator in ['>', '>=']:
+        return end > value
+    if operator == '<':
+        return start < value
+    if operator == '<=':
+        return start <= value
+    if operator == '==':
+        return start <= value < end
+    if operator == 'between':
+        return start <= value[1] and end > value[0]
+    if operator == 'in':
+        return any(start <= x < end for x in value)
+    return True
+
+
+def prune_partitions(partitions, filters):
+    """
+    Selects the partitions that can have records meeting the filters,
+    from the filters on partition keys and time elements. The time of the
+    observations (date_time) is that of their report (report_timestamp)
+
+    Parameters
+    ----------
+    partitions: list of partitions, as listed in the manifest
+    filters: list of (element, operator, value) tuples
+
+    Returns
+    -------
+    list: partitions
+    """
+    selected = []
+    for partition in partitions:
+        keys = partition.get('keys')
+        keep = True
+        for element, operator, value in filters:
+            element = element[1] if isinstance(element, (list, tuple)) else element
+            if element in keys:
+                label = keys.get(element)
+                if label == partitions_hdlr.default_partition:
+                    keep = False
+                else:
+                    # Compare as the partition values, numbers as numbers
+                    data_type = 'numeric' if pd.notna(pd.to_numeric(label, errors='coerce')) else 'varchar'
+                    keep = filter_mask(pd.DataFrame({element: [label]}), [(element, operator, value)],
+                                       {element: {'data_type': data_type}})[0]
+            elif element in partitions_hdlr.time_elements:
+                interval = partition_interval(keys)
+                if interval is not None:
+                    if operator == 'between':
+                        ivalue = typed_values(list(value), 'timestamp with timezone').tolist()
+                    elif operator in ['in', 'not in']:
+                        ivalue = typed_values(list(value), 'timestamp with timezone').dropna().tolist()
+                    else:
+                        ivalue = typed_values([value], 'timestamp with timezone').iloc[0]
+                    keep = interval_meets(interval, operator, ivalue)
+            if not keep:
+                break
+        if keep:
+            selected.append(partition)
+    return selected
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module to index the records of CDM table files by the values of an element
+(e.g. report_id), to read single records without parsing the full files.
+
+The index of a table is written next to its files, as:
+
+    - <filename root>-<element>.idx.npy: an entry per record, sorted by the element value,
+        with its value (key, utf-8 encoded), file (position in the files list), byte offset
+        in the file and length in bytes. It is read memory-mapped.
+    - <filename root>-<element>.idx.json: {'element', 'rows', 'files'}, with the list of the files
+        of the table (the table file, or its shards)
+
+Entries are appended to <filename root>-<element>.idx.tmp as the records are written
+(or as the files already written are scanned, see index_file), and sorted to the index
+when the table is closed.
+
+Only uncompressed files can be indexed.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+index_extension = '.idx'
+entries_columns = ['key', 'file', 'offset', 'length']
+
+
+def index_root(root, element):
+    """
+    Gets the root name of the index files of a table by an element
+
+    Parameters
+    ----------
+    root: root of the table file name (with no extension)
+    element: element indexed
+
+    Returns
+    -------
+    str: <root>-<element>.idx
+    """
+    return '{0}-{1}{2}'.format(root, element, index_extension)
+
+
+def record_lengths(data, rows):
+    """
+    Gets the length in bytes of the records of a printed table
+
+    Parameters
+    ----------
+    data: bytes with the records, one per line
+    rows: number of records
+
+    Returns
+    -------
+    np.array of lengths, None if the records are not one per line
+    """
+    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n')) + 1
+    if len(ends) != rows or (rows > 0 and ends[-1] != len(data)):
+        return None
+    return np.diff(ends, prepend=0)
+
+
+def remove_index(root):
+    """
+    Removes the files of an index, and its entries not written yet
+    """
+    for extension in ['.tmp', '.npy', '.json']:
+        if os.path.isfile(root + extension):
+            os.remove(root + extension)
+
+
+def append_entries(root, keys, file, offsets, lengths):
+    """
+    Appends entries to an index, written when the index is closed (see write_index)
+
+    Parameters
+    ----------
+    root: root of the index files, see index_root
+    keys: values of the element in the records
+    file: name of the file of the records
+    offsets: byte offsets of the records in the file
+    lengths: lengths in bytes of the records
+    """
+    entries = pd.DataFrame({'key': keys, 'file': file, 'offset': offsets, 'length': lengths},
+                           columns=entries_columns)
+    entries.to_csv(root + '.tmp', sep='\t', header=False, index=False, mode='a')
+
+
+def write_index(root, element):
+    """
+    Sorts the entries of an index and writes it
+
+    Parameters
+    ----------
+    root: root of the index files, see index_root
+    element: element indexed
+    """
+    if os.path.isfile(root + '.tmp'):
+        entries = pd.read_csv(root + '.tmp', sep='\t', header=None, names=entries_columns,
+                              dtype={'key': object, 'file': object, 'offset': 'int64', 'length': 'int64'},
+                              na_values=[], keep_default_na=False)
+    else:
+        entries = pd.DataFrame(columns=entries_columns)
+    keys = np.array([x.encode('utf-8') for x in entries['key']], dtype=bytes)
+    file_ids, files = pd.factorize(entries['file'])
+    index = np.zeros(len(entries), dtype=[('key', keys.dtype if len(keys) > 0 else 'S1'), ('file', 'uint32'),
+                                          ('offset', 'uint64'), ('length', 'uint32')])
+    order = np.argsort(keys, kind='stable')
+    index['key'] = keys[order]
+    index['file'] = file_ids[order]
+    index['offset'] = entries['offset'].to_numpy()[order]
+    index['length'] = entries['length'].to_numpy()[order]
+    np.save(root + '.npy', index)
+    with open(root + '.json', 'w') as fileObj:
+        json.dump({'element': element, 'rows': len(index), 'files': list(files)}, fileObj, indent=2)
+    if os.path.isfile(root + '.tmp'):
+        os.remove(root + '.tmp')
+
+
+def line_ends(file_path, block_size=1 << 26):
+    """
+    Gets the byte offsets of the ends of the lines of a file, reading it in blocks
+    """
+    ends = []
+    size = 0
+    with open(file_path, 'rb') as fileObj:
+        while True:
+            block = fileObj.read(block_size)
+            if not block:
+                break
+            ends.append(np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n')) + size + 1)
+            size += len(block)
+    ends = np.concatenate(ends) if ends else np.array([], dtype=np.int64)
+    # Last line with no new line
+    if size > 0 and (len(ends) == 0 or ends[-1] != size):
+        ends = np.append(ends, size)
+    return ends
+
+
+def index_file(file_path, roots, delimiter='|', null_label='null'):
+    """
+    Adds the records of a table file, already written, to indexes
+
+    Parameters
+    ----------
+    file_path: path of the file (uncompressed)
+    roots: dictionary with the {element: root of the index files}, see index_root
+    delimiter: default is '|'
+    null_label: value of missing values, not indexed
+
+    Returns
+    -------
+    str: error message, None if indexed
+    """
+    columns = pd.read_csv(file_path, delimiter=delimiter, nrows=0).columns
+    elements = [x for x in roots.keys() if x in columns]
+    keys = pd.read_csv(file_path, delimiter=delimiter, usecols=elements, dtype=object, na_filter=False)
+    ends = line_ends(file_path)
+    if len(ends) != len(keys) + 1:
+        return 'Records in multiple lines, file {} not indexed'.format(file_path)
+    offsets = ends[:-1]
+    lengths = np.diff(ends)
+    for element in elements:
+        values = keys[element].to_numpy()
+        rows = values != null_label
+        append_entries(roots.get(element), values[rows], os.path.basename(file_path), offsets[rows], lengths[rows])
+    return None
+
+
+def read_index(root):
+    """
+    Reads an index, memory-mapped
+
+    Parameters
+    ----------
+    root: root of the index files, see index_root
+
+    Returns
+    -------
+    (np.memmap with the entries, dictionary with the index description), None if there is no index
+    """
+    if not os.path.isfile(root + '.json') or not os.path.isfile(root + '.npy'):
+        return None
+    with open(root + '.json') as fileObj:
+        description = json.load(fileObj)
+    return np.load(root + '.npy', mmap_mode='r'), description
+
+
+def lookup(index, values):
+    """
+    Gets the entries of an index of a set of values, with a binary search
+
+    Parameters
+    ----------
+    index: np.array with the entries, see read_index
+    values: list of values of the element
+
+    Returns
+    -------
+    np.array with the entries, in the order of the files
+    """
+    keys = index['key']
+    width = keys.dtype.itemsize
+    encoded = [str(x).encode('utf-8') for x in values]
+    encoded = np.array([x for x in encoded if len(x) <= width], dtype=keys.dtype)
+    left = np.searchsorted(keys, encoded, side='left')
+    right = np.searchsorted(keys, encoded, side='right')
+    rows = np.unique(np.concatenate([np.arange(x, y) for x, y in zip(left, right)] + [np.array([], dtype=int)]))
+    entries = np.asarray(index[rows])
+    return entries[np.lexsort((entries['offset'], entries['file']))]
+
+
+def read_records(file_path, offsets, lengths):
+    """
+    Reads records from a table file, with its header line
+
+    Parameters
+    ----------
+    file_path: path to the file
+    offsets: byte offsets of the records, sorted
+    lengths: lengths in bytes of the records
+
+    Returns
+    -------
+    bytes: header and records
+    """
+    pieces = []
+    with open(file_path, 'rb') as fileObj:
+        pieces.append(fileObj.readline())
+        start = None
+        end = None
+        # Contiguous records are read at once
+        for offset, length in zip(offsets, lengths):
+            offset, length = int(offset), int(length)
+            if start is not None and offset == end:
+                end += length
+                continue
+            if start is not None:
+                fileObj.seek(start)
+                pieces.append(fileObj.read(end - start))
+            start, end = offset, offset + length
+        if start is not None:
+            fileObj.seek(start)
+            pieces.append(fileObj.read(end - start))
+    return b''.join(pieces)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Module to partition CDM tables in Hive style directories, e.g.:
+
+    out_dir/year=1950/month=08/platform_type=2/header-<tb_id>.psv
+
+Partition keys can be:
+    - year, month: from the report_timestamp (header) or date_time (observations) elements
+    - any other element of the tables, e.g. platform_type
+
+Records with no value of a key are in the key=__HIVE_DEFAULT_PARTITION__ directory.
+
+The partitions written are listed in a manifest file (manifest.json) in the
+root directory, used to select the partitions to read.
+"""
+
+import os
+import json
+from urllib.parse import quote
+import pandas as pd
+
+manifest_name = 'manifest.json'
+default_partition = '__HIVE_DEFAULT_PARTITION__'
+
+# Time keys: format of their values
+time_keys = {'year': '{:04d}', 'month': '{:02d}'}
+# Elements the time keys are derived from, by order of preference
+time_elements = ['report_timestamp', 'date_time']
+
+
+def partition_label(key, value):
+    """
+    Gets the directory label of a partition key value
+
+    Parameters
+    ----------
+    key: partition key
+    value: value of the key
+
+    Returns
+    -------
+    str: label
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return default_partition
+    if key in time_keys:
+        return time_keys.get(key).format(int(float(value)))
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return quote(str(value), safe='')
+
+
+def partition_labels(table, key):
+    """
+    Gets the partition labels of the records of a table for a key
+
+    Parameters
+    ----------
+    table: pandas.DataFrame with the CDM table
+    key: partition key
+
+    Returns
+    -------
+    pd.Series with the labels, None if the key cannot be derived from the table
+    """
+    if key in time_keys:
+        element = next((x for x in time_elements if x in table), None)
+        if element is None:
+            return None
+        values = pd.to_datetime(table[element], errors='coerce')
+        values = getattr(values.dt, key)
+    elif key in table:
+        values = table[key]
+    else:
+        return None
+    # Each distinct value is labelled once
+    codes, uniques = pd.factorize(values)
+    labels = pd.Series([partition_label(key, x) for x in uniques] + [default_partition], dtype=object)
+    return pd.Series(labels.to_numpy()[codes], index=table.index)
+
+
+def partition_path(keys):
+    """
+    Gets the relative path of a partition
+
+    Parameters
+    ----------
+    keys: dictionary with the {key: label} of the partition
+
+    Returns
+    -------
+    str: path
+    """
+    return os.path.join(*['{0}={1}'.format(k, v) for k, v in keys.items()])
+
+
+def read_manifest(tb_path):
+    """
+    Reads the manifest of a partitioned directory
+
+    Parameters
+    ----------
+    tb_path: root directory of the partitions
+
+    Returns
+    -------
+    dict: manifest, None if the directory is not partitioned
+    """
+    manifest_path = os.path.join(tb_path, manifest_name)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path) as fileObj:
+        return json.load(fileObj)
+
+
+def write_manifest(tb_path, manifest):
+    """
+    Writes the manifest of a partitioned directory
+
+    Parameters
+    ----------
+    tb_path: root directory of the partitions
+    manifest: dictionary with the manifest
+    """
+    with open(os.path.join(tb_path, manifest_name), 'w') as fileObj:
+        json.dump(manifest, fileObj, indent=2)
+
+
+def select_partitions(manifest, partitions=None):
+    """
+    Selects the partitions in a manifest
+
+    Parameters
+    ----------
+    manifest: dictionary with the manifest
+    partitions: filter of the partitions to select:
+        - a dictionary with {key: value or list of values}, e.g. {'year': 1950, 'month': [1, 2]}
+        - a function of the dictionary with the {key: label} of a partition, returning True to select it
+        - None to select all
+
+    Returns
+    -------
+    list: selected partitions, as listed in the manifest
+    """
+    if partitions is None:
+        return manifest.get('partitions')
+    if callable(partitions):
+        return [x for x in manifest.get('partitions') if partitions(x.get('keys'))]
+    labels = {}
+    for key, values in partitions.items():
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        labels[key] = [partition_label(key, x) for x in values]
+    return [x for x in manifest.get('partitions')
+            if all(x.get('keys').get(key) in values for key, values in labels.items())]
@@ -26,6 +26,8 @@ import datashader as ds
 import xarray as xr
 import pandas as pd
 from cdm import properties
+from cdm.common import arrow_hdlr
+from cdm.common import cache_hdlr
 import datetime
 import logging
 import glob
@@ -71,6 +73,44 @@ DELIMITER = '|'
 
 
 # SOME FUNCTIONS THAT HELP ----------------------------------------------------
+def read_table(table_file, usecols, dtype, date_column, engine='c', cache=None):
+    """
+    Reads a table file, with the pandas parser or the multithreaded Arrow CSV reader
+
+    Parameters
+    ----------
+    table_file: path to the file
+    usecols: columns to read
+    dtype: dictionary with the {column: dtype}
+    date_column: column parsed to datetime
+    engine: 'c' (pandas parser) or 'pyarrow'. Falls back to the pandas parser if the file
+        cannot be read with pyarrow
+    cache: True or path to a cache directory to read the file from its Arrow IPC cache (memory-mapped),
+        see common/cache_hdlr.py. Falls back to the engine if the file cannot be cached
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if cache and cache_hdlr.pa is not None:
+        try:
+            df = cache_hdlr.read_cache(table_file, cache, delimiter=DELIMITER, usecols=usecols,
+                                       dtype={x: dtype.get(x) for x in usecols if x != date_column})
+            df[date_column] = pd.to_datetime(df[date_column])
+            return df
+        except Exception as e:
+            logging.warning('Parsing {}, cannot be read from its cache: {}'.format(table_file, e))
+    if engine == 'pyarrow' and arrow_hdlr.pa_csv is not None:
+        try:
+            df = arrow_hdlr.read_csv(table_file, delimiter=DELIMITER, usecols=usecols,
+                                     dtype={x: dtype.get(x) for x in usecols if x != date_column})
+            df[date_column] = pd.to_datetime(df[date_column])
+            return df
+        except Exception as e:
+            logging.warning('Reading {} with the pandas parser, not supported by pyarrow: {}'.format(table_file, e))
+    return pd.read_csv(table_file, delimiter=DELIMITER, usecols=usecols, parse_dates=[date_column], dtype=dtype)
+
+
 def bounds(x_range, y_range):
     """
 
@@ -105,7 +145,7 @@ def create_canvas(bbox, degree_factor):
 
 # FUNCTIONS TO DO WHAT WE WANT ------------------------------------------------
 def from_cdm_monthly(dir_data, cdm_id=None, region='Global',
-                     resolution='lo_res', nc_dir=None, qc=None, qc_report=None):
+                     resolution='lo_res', nc_dir=None, qc=None, qc_report=None, engine='c', cache=None):
     """
 
     Parameters
@@ -117,6 +157,10 @@ def from_cdm_monthly(dir_data, cdm_id=None, region='Global',
     nc_dir
     qc
     qc_report
+    engine: parser engine of the table files, 'c' (pandas parser, default) or 'pyarrow'
+        (Arrow CSV reader, multithreaded)
+    cache: True to read the table files from Arrow IPC caches next to them (built the first time
+        they are read), or path to a cache directory. Default is None, the files are parsed
 
     Returns
     -------
@@ -137,8 +181,7 @@ def from_cdm_monthly(dir_data, cdm_id=None, region='Global',
     if not os.path.isfile(table_file):
         logging.error('Table file not found {}'.format(table_file))
         return
-    df_header = pd.read_csv(table_file, delimiter=DELIMITER, usecols=READ_COLS_HDR,
-                            parse_dates=['report_timestamp'], dtype=DTYPES_HDR)
+    df_header = read_table(table_file, READ_COLS_HDR, DTYPES_HDR, 'report_timestamp', engine=engine, cache=cache)
     df_header.set_index('report_id', inplace=True, drop=True)
 
     if qc_report:
@@ -173,8 +216,7 @@ def from_cdm_monthly(dir_data, cdm_id=None, region='Global',
             logging.warning('Table file not found {}'.format(table_file))
             continue
         # Read the data
-        df = pd.read_csv(table_file, delimiter=DELIMITER, usecols=READ_COLS,
-                         parse_dates=['date_time'], dtype=DTYPES)
+        df = read_table(table_file, READ_COLS, DTYPES, 'date_time', engine=engine, cache=cache)
 
         df.set_index('report_id', inplace=True, drop=True)
 
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compiles arithmetic expressions declared in the imodel mapping files
+(table_name.json) into vectorized kernels.
+
+An expression is declared in a mapping element with the ``expression`` key,
+using the imodel element names (without section) as variables:
+
+    "observation_value": {
+        "sections": "core",
+        "elements": "AT",
+        "expression": "AT + 273.15"
+    }
+
+Expressions are parsed and validated once, when the mapping is set up, and
+evaluated over the full element arrays:
+    - with numexpr, if available, as a single fused kernel
+    - with numpy otherwise, from the validated expression tree
+
+Supported syntax: numeric constants, element names, the arithmetic operators
++, -, *, /, //, %, **, comparisons (not chained, e.g. not ``a < b < c``) and the
+functions in ``functions``.
+"""
+
+import ast
+import numpy as np
+import pandas as pd
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+functions = {'abs': np.abs, 'sqrt': np.sqrt, 'exp': np.exp, 'log': np.log,
+             'log10': np.log10, 'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+             'arcsin': np.arcsin, 'arccos': np.arccos, 'arctan': np.arctan,
+             'arctan2': np.arctan2, 'where': np.where, 'round': np.round}
+
+allowed_nodes = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call,
+                 ast.Name, ast.Load, ast.Constant,
+                 ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+                 ast.USub, ast.UAdd,
+                 ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# numexpr does not support these operators and functions
+numpy_only_nodes = (ast.FloorDiv,)
+numpy_only_functions = ('round',)
+
+
+def element_names(elements):
+    """
+    Gets the expression variable names of the imodel elements
+
+    Parameters
+    ----------
+    elements: list of imodel elements, as (section, element) tuples or names
+
+    Returns
+    -------
+    names: list of element names
+    """
+    return [x[-1] if isinstance(x, tuple) else x for x in elements]
+
+
+def compile_expression(expression, elements):
+    """
+    Validates and compiles an expression over a set of imodel elements
+
+    Parameters
+    ----------
+    expression: string with the expression to compile, e.g. ``"-W * 0.5144"``
+    elements: list of imodel elements the expression is evaluated on,
+        in the order they are passed to the kernel
+
+    Returns
+    -------
+    kernel: function that takes the element(s) data (pd.Series or
+        pd.DataFrame) and returns the evaluated np.array
+
+    Raises
+    ------
+    ValueError: if the expression is not valid for the elements
+    """
+    names = element_names(elements)
+    if len(set(names)) < len(names):
+        raise ValueError('Duplicated element names in expression elements: {}'.format(",".join(names)))
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError('Could not parse expression {0}: {1}'.format(expression, e))
+
+    use_numexpr = numexpr is not None
+    for node in ast.walk(tree):
+        if not isinstance(node, allowed_nodes):
+            raise ValueError('Expression {0}: {1} not supported'.format(expression, type(node).__name__))
+        if isinstance(node, numpy_only_nodes):
+            use_numexpr = False
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError('Expression {0}: only numeric constants supported'.format(expression))
+        if isinstance(node, ast.Compare) and len(node.ops) > 1:
+            raise ValueError('Expression {0}: chained comparisons not supported'.format(expression))
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in functions or node.keywords:
+                raise ValueError('Expression {0}: function not supported'.format(expression))
+            if node.func.id in numpy_only_functions:
+                use_numexpr = False
+        elif isinstance(node, ast.Name) and node.id not in names and node.id not in functions:
+            raise ValueError('Expression {0}: {1} not in elements {2}'.format(expression, node.id, ",".join(names)))
+
+    code = compile(tree, '<expression>', 'eval')
+    namespace = {'__builtins__': {}}
+    namespace.update(functions)
+
+    def kernel(data):
+        if isinstance(data, pd.Series):
+            data = data.to_frame()
+        arrays = {}
+        for name, i in zip(names, range(0, len(data.columns))):
+            values = data.iloc[:, i]
+            if values.dtype in ('float32', 'float64'):
+                values = values.to_numpy()
+            else:
+                values = values.to_numpy(dtype='float64', na_value=np.nan)
+            arrays[name] = values
+        if use_numexpr:
+            return numexpr.evaluate(expression, local_dict=arrays)
+        return eval(code, namespace, arrays)
+
+    return kernel
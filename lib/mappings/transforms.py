@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared library of transform functions to map imodel elements to CDM elements.
+
+Transforms are registered by name in the module level ``transforms`` registry
+and referenced by that name in the imodel mapping files (table_name.json),
+either as ``transform`` or as ``decimal_places``.
+
+All transforms in the registry are vectorized: they operate on full
+pd.Series / pd.DataFrame objects and never loop over rows in python.
+
+Each registered transform declares:
+    - in_dtype: kind of imodel elements it expects ('numeric', 'object' or
+    None if any)
+    - out_dtype: CDM data_type (pseudo-sql) it returns (None if any)
+    - atts: whether it needs the imodel data attributes
+
+Transforms defined in an imodel's ``mapping_functions`` class take
+precedence over the ones registered here, so that a specific imodel can
+override the shared behaviour of any of them.
+
+Transforms that are naturally written for a single value can be declared as
+scalar kernels with the ``scalar_kernel`` decorator, both here and in the
+imodel's ``mapping_functions`` class. Scalar kernels are compiled with numba
+when available and fall back to a numpy vectorized version otherwise.
+"""
+
+import datetime
+import functools
+import inspect
+import math
+import numpy as np
+import pandas as pd
+from cdm.common import logging_hdlr
+
+try:
+    import numba
+    from numba.core.errors import NumbaError
+except ImportError:
+    numba = None
+    NumbaError = None
+
+logger = logging_hdlr.init_logger(__name__, level='INFO')
+
+transforms = {}
+
+
+def register(in_dtype=None, out_dtype=None, atts=False):
+    """
+    Decorator to register a function in the shared transforms registry
+
+    Parameters
+    ----------
+    in_dtype: kind of the imodel elements the function expects
+        ('numeric', 'object' or None if any)
+    out_dtype: CDM data_type returned by the function (None if any)
+    atts: if True, the imodel data attributes are passed to the function
+        as keyword argument ``atts``
+
+    Returns
+    -------
+    decorator: registers the function with its name and returns it unchanged
+    """
+    def decorator(func):
+        transforms[func.__name__] = {'function': func, 'in_dtype': in_dtype,
+                                     'out_dtype': out_dtype, 'atts': atts}
+        return func
+    return decorator
+
+
+def get_transform(name, imodel_functions=None, atts=None):
+    """
+    Binds a transform by name, giving precedence to the imodel functions
+
+    Parameters
+    ----------
+    name: name of the transform as declared in the mapping file
+    imodel_functions: instance of the imodel mapping_functions class, if any
+    atts: imodel data attributes
+
+    Returns
+    -------
+    transform: the bound callable, None if not found
+    """
+    if imodel_functions is not None and hasattr(imodel_functions, name):
+        return getattr(imodel_functions, name)
+    transform = transforms.get(name)
+    if not transform:
+        return
+    if transform.get('atts'):
+        return functools.partial(transform.get('function'), atts=atts)
+    return transform.get('function')
+
+
+class ScalarKernel():
+    """
+    Transform built from a scalar function, applied to the full element arrays.
+
+    The scalar function gets one positional argument per imodel element, in
+    the order declared in the mapping file, followed by its keyword arguments.
+    It is compiled on first use with numba (nopython mode), if available.
+    Otherwise, or if numba cannot compile it, the fallback function is used:
+    this is the user provided vectorized version, if any, or the scalar
+    function vectorized with numpy. Argument types numba cannot compile the
+    function for use the fallback from then on; errors other than numba
+    compilation errors are raised.
+    """
+    def __init__(self, func, otype='float64', fallback=None, jit=True):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.otype = otype
+        self.fallback = fallback if fallback else np.vectorize(func, otypes=[otype])
+        self.parameters = list(inspect.signature(func).parameters.values())
+        self.kernel = numba.vectorize(nopython=True)(func) if (jit and numba is not None) else None
+        # numba types of the arguments the kernel could not be compiled for
+        self.failed = set()
+
+    def __call__(self, data, **kwargs):
+        if isinstance(data, pd.DataFrame):
+            arrays = [data.iloc[:, i] for i in range(0, len(data.columns))]
+        elif isinstance(data, pd.Series):
+            arrays = [data]
+        else:
+            arrays = [pd.Series(np.asarray(data))]
+        # numba only handles numpy numeric arrays: extension arrays (e.g. nullable integers) and
+        # objects are converted to float64, missing values to NaN
+        arrays = [x.to_numpy() if isinstance(x.dtype, np.dtype) and x.dtype.kind in 'iuf'
+                  else x.to_numpy(dtype='float64', na_value=np.nan) for x in arrays]
+        missing = [x.name for x in self.parameters[len(arrays):] if x.name not in kwargs and x.default is x.empty]
+        if missing:
+            raise TypeError('Scalar kernel {0} missing required argument(s): {1}'.format(
+                self.__name__, ",".join(missing)))
+        args = arrays + [kwargs.get(x.name, x.default) for x in self.parameters[len(arrays):]]
+        if self.kernel is not None:
+            try:
+                signature = tuple(numba.typeof(x) for x in args)
+            except (TypeError, ValueError):
+                # Arguments numba cannot type
+                signature = None
+            if signature is not None and signature not in self.failed:
+                try:
+                    return self.kernel(*args).astype(self.otype)
+                except NumbaError:
+                    logger.warning('Could not compile scalar kernel {0} with numba for {1}, using fallback'.format(
+                        self.__name__, signature), exc_info=True)
+                    self.failed.add(signature)
+        return np.asarray(self.fallback(*args)).astype(self.otype)
+
+
+def scalar_kernel(otype='float64', fallback=None, jit=True):
+    """
+    Decorator to declare a scalar function as a transform kernel
+
+    Parameters
+    ----------
+    otype: numpy data type of the kernel output
+    fallback: vectorized version of the function, used when numba is not
+        available. Defaults to the scalar function vectorized with numpy.
+    jit: if False, never compile the function with numba
+
+    Returns
+    -------
+    decorator: wraps the function in a ScalarKernel
+    """
+    def decorator(func):
+        return ScalarKernel(func, otype=otype, fallback=fallback, jit=jit)
+    return decorator
+
+
+# AUXILIARY -------------------------------------------------------------------
+def decimalhour_to_HM(ds):
+    """
+    Splits decimal hours in hours and minutes
+
+    Parameters
+    ----------
+    ds: array like with decimal hours
+
+    Returns
+    -------
+    hours, minutes: np.arrays of int
+    """
+    ds = np.asarray(ds, dtype='float64')
+    hours = np.floor(ds).astype(int)
+    minutes = np.floor(60.0 * np.fmod(ds, 1)).astype(int)
+    return hours, minutes
+
+
+# DATETIMES -------------------------------------------------------------------
+@register(in_dtype='numeric', out_dtype='timestamp with timezone')
+def datetime_imma1(df):  # TZ awareness?
+    hours, minutes = decimalhour_to_HM(df.iloc[:, -1].values)
+    parts = {'year': df.iloc[:, 0].values, 'month': df.iloc[:, 1].values,
+             'day': df.iloc[:, 2].values, 'hour': hours, 'minute': minutes}
+    parts = pd.DataFrame({k: pd.to_numeric(v, errors='coerce') for k, v in parts.items()})
+    return pd.DatetimeIndex(pd.to_datetime(parts, errors='coerce'))
+
+
+@register(out_dtype='timestamp with timezone')
+def datetime_utcnow():
+    return datetime.datetime.utcnow()
+
+
+@register(out_dtype='varchar')
+def lineage(ds, text='Initial conversion from ICOADS R3.0.0T'):
+    return datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S') + '. ' + text
+
+
+# DECIMAL PLACES --------------------------------------------------------------
+@register(out_dtype='int', atts=True)
+def decimal_places(element, atts=None):
+    return atts.get(element[0]).get('decimal_places')
+
+
+@register(out_dtype='int', atts=True)
+def decimal_places_temperature_kelvin(element, atts=None):
+    origin_decimals = atts.get(element[0]).get('decimal_places')
+    if origin_decimals <= 2:
+        return 2
+    else:
+        return origin_decimals
+
+
+@register(out_dtype='int', atts=True)
+def decimal_places_pressure_pascal(element, atts=None):
+    origin_decimals = atts.get(element[0]).get('decimal_places')
+    if origin_decimals > 2:
+        return origin_decimals - 2
+    else:
+        return 0
+
+
+# NUMERIC ---------------------------------------------------------------------
+@register(in_dtype='numeric', out_dtype='numeric')
+def feet_to_m(ds, float_type='float32'):
+    return np.round(ds/3.2808, 2)
+
+
+@register(in_dtype='numeric', out_dtype='numeric')
+def float_opposite(ds):
+    return -ds
+
+
+@register(in_dtype='numeric', out_dtype='numeric')
+def float_scale(ds, factor=1):
+    return ds*factor
+
+
+@register(out_dtype='numeric')
+def integer_to_float(ds, float_type='float32'):
+    return ds.astype(float_type)
+
+
+@register(in_dtype='numeric', out_dtype='numeric')
+def temperature_celsius_to_kelvin(ds):
+    return ds + 273.15
+
+
+# LOCATION --------------------------------------------------------------------
+def location_accuracy_vectorized(li, lat):
+    """
+    Vectorized version of location_accuracy, used when numba is not available
+    """
+    degrees = {0: .1, 1: 1, 4: 1/60, 5: 1/3600}
+    deg_km = 111
+    li = pd.Series(np.asarray(li)).astype(int).map(degrees).values.astype('float64')
+    lat = np.radians(np.asarray(lat, dtype='float64'))
+    accuracy = li*np.sqrt((deg_km**2)*(1 + np.cos(lat)**2))
+    # np.round is half to even, as the python builtin round
+    return np.where(np.isnan(accuracy), np.nan, np.maximum(1, np.round(accuracy)))
+
+
+@register(out_dtype='numeric')
+@scalar_kernel(otype='float32', fallback=location_accuracy_vectorized)
+def location_accuracy(li, lat):  # (li_core,lat_core)
+    #    math.sqrt(111**2)=111.0
+    #    math.sqrt(2*111**2)=156.97770542341354
+    #   Previous implementation:
+    #    degrees = {0: .1,1: 1,2: fmiss,3: fmiss,4: 1/60,5: 1/3600,imiss: fmiss}
+    li = int(li)
+    if li == 0:
+        degrees = .1
+    elif li == 1:
+        degrees = 1.0
+    elif li == 4:
+        degrees = 1/60
+    elif li == 5:
+        degrees = 1/3600
+    else:
+        return np.nan
+    deg_km = 111
+    accuracy = degrees*math.sqrt((deg_km**2)*(1 + math.cos(math.radians(lat))**2))
+    return max(1.0, float(round(accuracy)))
+
+
+@register(in_dtype='numeric', out_dtype='numeric')
+def longitude_360to180(ds):
+    lon = np.asarray(ds)
+    return np.where(lon > 180, -180 + np.fmod(lon.astype('float64'), 180), lon)
+
+
+# CODES -----------------------------------------------------------------------
+@register(in_dtype='object', out_dtype='int[]')
+def observing_programme(ds):
+    op = {str(i): [5, 7, 56] for i in range(0, 6)}
+    op.update({'7': [5, 7, 9]})
+    return ds.map(op, na_action='ignore')
+    # Previous version:
+    # observing_programmes = { range(1, 5): '{7, 56}',7: '{5,7,9}'}
+    # if no PT, assume ship
+    # Set only for drifting buoys. Rest assumed ships!
+
+
+@register(in_dtype='object', out_dtype='int')
+def time_accuracy(ds):  # ti_core
+    # Shouldn't we use the code_table mapping for this? see CDM!
+    secs = {'0': 3600, '1': int(round(3600/10)), '2': int(round(3600/60)), '3': int(round(3600/100))}
+    return ds.map(secs, na_action='ignore')
+
+
+# STRINGS ---------------------------------------------------------------------
+@register(out_dtype='varchar')
+def df_col_join(df, sep):
+    joint = df.iloc[:, 0].astype(str)
+    for i in range(1, len(df.columns)):
+        joint = joint + sep + df.iloc[:, i].astype(str)
+    return joint
+
+
+@register(out_dtype='varchar')
+def string_add(ds, prepend=None, append=None, separator=None, zfill_col=None, zfill=None):
+    # zfill_col and zfill only apply to string_join_add
+    separator = '' if not separator else separator
+    ds = ds.astype(str)
+    # Equivalent to separator.join(filter(None,[prepend,ds,append])), empty ds
+    # values are returned as missing
+    joint = ds
+    if prepend:
+        joint = prepend + separator + joint
+    if append:
+        joint = joint + separator + append
+    return joint.where(ds.str.len() > 0)
+
+
+@register(out_dtype='varchar')
+def string_join_add(df, prepend=None, append=None, separator=None, zfill_col=None, zfill=None):
+    separator = '' if not separator else separator
+    columns = [df.iloc[:, i].astype(str) for i in range(0, len(df.columns))]
+    if zfill_col and zfill:
+        for col, width in zip(zfill_col, zfill):
+            columns[col] = columns[col].str.zfill(width)
+    joint = columns[0]
+    for column in columns[1:]:
+        joint = joint + separator + column
+    return string_add(joint, prepend=prepend, append=append, separator=separator)
@@ -19,12 +19,79 @@ import importlib
 from cdm import properties
 from cdm.common import pandas_TextParser_hdlr
 from cdm.common import logging_hdlr
+from cdm.common import arrow_hdlr
 from cdm.lib.tables import tables_hdlr
 from cdm.lib.mappings import mappings_hdlr
+from cdm.lib.mappings import transforms
+from cdm.lib.mappings import expressions
 
 module_path = os.path.dirname(os.path.abspath(__file__))
 
 
+def _bind_transforms(imodel_maps, imodel_functions, data_atts, cdm_atts, logger):
+    """
+    Binds the transform and decimal places functions declared in the imodel mappings and
+    validates them against the declared input and output data types. Compiles the
+    expressions declared in the imodel mappings.
+
+    Parameters
+    ----------
+    imodel_maps: imodel mappings to CDM tables
+    imodel_functions: instance of the imodel mapping_functions class, None if not available
+    data_atts: dictionary with the {element_name:element_attributes} of the data
+    cdm_atts: CDM table attributes
+    logger: logger to report to
+
+    Returns
+    -------
+    imodel_transforms: a python dictionary with the ``{function_name: function}`` and
+        ``{(expression, elements): kernel}`` pairs, None if any of the functions is not found or
+        any of the expressions is not valid.
+    """
+    imodel_transforms = {}
+    for table, mapping in imodel_maps.items():
+        for cdm_key, imapping in mapping.items():
+            elements = imapping.get('elements')
+            expression = imapping.get('expression')
+            if expression:
+                if not elements:
+                    logger.error('Expression {0} to map {1}.{2} has no elements'.format(expression, table, cdm_key))
+                    return
+                try:
+                    # Same expression on different elements needs a different kernel
+                    imodel_transforms[(expression, tuple(elements))] = expressions.compile_expression(expression,
+                                                                                                       elements)
+                except ValueError as e:
+                    logger.error('Invalid expression to map {0}.{1}: {2}'.format(table, cdm_key, e))
+                    return
+            for name in [imapping.get('transform'), imapping.get('decimal_places')]:
+                if not isinstance(name, str):
+                    continue
+                if name not in imodel_transforms:
+                    imodel_transforms[name] = transforms.get_transform(name, imodel_functions, data_atts)
+                if imodel_transforms[name] is None:
+                    logger.error('Function {0} to map {1}.{2} not found in imodel functions or in '
+                                 'shared transforms'.format(name, table, cdm_key))
+                    return
+            # Declared data types are only known for shared transforms not overridden by the imodel
+            transform = imapping.get('transform')
+            if not isinstance(transform, str) or hasattr(imodel_functions, transform):
+                continue
+            in_dtype = transforms.transforms.get(transform).get('in_dtype')
+            out_dtype = transforms.transforms.get(transform).get('out_dtype')
+            if in_dtype == 'numeric' and elements:
+                not_numeric = [x for x in elements if x in data_atts and
+                               data_atts.get(x).get('column_type') not in properties.numeric_types]
+                if len(not_numeric) > 0:
+                    logger.warning('Transform {0} to map {1}.{2} expects numeric elements: {3}'.format(
+                        transform, table, cdm_key, ",".join([str(x) for x in not_numeric])))
+            cdm_type = cdm_atts.get(table, {}).get(cdm_key, {}).get('data_type')
+            if out_dtype and cdm_type and out_dtype != cdm_type and (out_dtype, cdm_type) != ('int', 'numeric'):
+                logger.warning('Transform {0} returns {1} to map {2}.{3} of type {4}'.format(
+                    transform, out_dtype, table, cdm_key, cdm_type))
+    return imodel_transforms
+
+
 def _map(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
     """
     Maps a pandas DataFrame (or pd.io.parsers.TextFileReader) to the C3S Climate Data Store Common Data Model (CDM)
@@ -69,8 +136,9 @@ def _map(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
             logger.error('No mappings found for model {}'.format(imodel))
             return
         # Import function modules and instantiate class with data_atts
+        imodel_functions = None
         imodel_functions_mdl_tree = mappings_hdlr.get_functions_module_path(imodel)
-        if len(imodel_functions_mdl_tree) > 0:
+        if imodel_functions_mdl_tree:
             imodel_functions_mdl = importlib.import_module(imodel_functions_mdl_tree, package=None)
             imodel_functions = imodel_functions_mdl.mapping_functions(data_atts)
         else:
@@ -91,6 +159,10 @@ def _map(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
         return
     # Read CDM table attributes
     cdm_atts = tables_hdlr.load_tables()
+    # Bind transforms and decimal places functions, imodel functions override shared ones
+    imodel_transforms = _bind_transforms(imodel_maps, imodel_functions, data_atts, cdm_atts, logger)
+    if imodel_transforms is None:
+        return
     # Check that imodel cdm tables are consistent with CDM tables (at least in naming....)
     not_in_tool = [x for x in imodel_maps.keys() if x not in cdm_atts.keys()]
     if len(not_in_tool) > 0:
@@ -104,13 +176,17 @@ def _map(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
     cdm_tables = {k: {'buffer': StringIO(), 'atts': cdm_atts.get(k)} for k in imodel_maps.keys()}
     # Create pandas data types for buffer reading from CDM table definition pseudo-sql dtypes
     # Also keep track of datetime columns for reader to parse
+    # Array elements (int[], varchar[]...) are kept apart as python lists, they do not go through the buffer
     date_columns = {x: [] for x in imodel_maps.keys()}
     out_dtypes = {x: {} for x in imodel_maps.keys()}
+    array_columns = {x: [] for x in imodel_maps.keys()}
     for table in out_dtypes:
-        out_dtypes[table].update(
-            {x: cdm_atts.get(table, {}).get(x, {}).get('data_type') for x in imodel_maps[table].keys()})
+        sql_dtypes = {x: cdm_atts.get(table, {}).get(x, {}).get('data_type') for x in imodel_maps[table].keys()}
+        array_columns[table].extend([x for x, v in sql_dtypes.items() if v and v.endswith('[]')])
+        out_dtypes[table].update({k: v for k, v in sql_dtypes.items() if k not in array_columns[table]})
         date_columns[table].extend(
             [i for i, x in enumerate(list(out_dtypes[table].keys())) if 'timestamp' in out_dtypes[table].get(x)])
+        cdm_tables[table]['arrays'] = []
         out_dtypes[table].update(
             {k: properties.pandas_dtypes.get('from_sql').get(v, 'object') for k, v in out_dtypes[table].items()})
 
@@ -123,9 +199,9 @@ def _map(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
             logger.debug('Table: {}'.format(table))
             for cdm_key, imapping in mapping.items():
                 logger.debug('\tElement: {}'.format(cdm_key))
-                [elements, transform, kwargs, code_table, default, fill_value, decimal_places] = [
+                [elements, transform, expression, kwargs, code_table, default, fill_value, decimal_places] = [
                     imapping.get('elements'),
-                    imapping.get('transform'), imapping.get('kwargs'),
+                    imapping.get('transform'), imapping.get('expression'), imapping.get('kwargs'),
                     imapping.get('code_table'), imapping.get('default'),
                     imapping.get('fill_value'), imapping.get('decimal_places')]
 
@@ -154,8 +230,7 @@ def _map(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
                     logger.debug('\ttransform: {}'.format(transform))
                     logger.debug('\tkwargs: {}'.format(",".join(list(kwargs.keys()))))
 
-                    #os._exit(1)
-                    trans = eval('imodel_functions.' + transform)
+                    trans = imodel_transforms.get(transform)
                     logger.debug('\ttable_df_i Index: {}'.format(table_df_i.index))
                     logger.debug('\tidata_i Index: {}'.format(idata.index))
                     logger.debug('\tnotna_idx: {}'.format(notna_idx))
@@ -165,6 +240,9 @@ def _map(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
                         table_df_i.loc[notna_idx, cdm_key] = trans(to_map, **kwargs)
                     else:
                         table_df_i[cdm_key] = trans(**kwargs)
+                elif expression and not isEmpty:
+                    logger.debug('\texpression: {}'.format(expression))
+                    table_df_i.loc[notna_idx, cdm_key] = imodel_transforms.get((expression, tuple(elements)))(to_map)
                 elif code_table and not isEmpty:
                     # https://stackoverflow.com/questions/45161220/how-to-map-a-pandas-dataframe-column-to-a-nested-dictionary?rq=1
                     # Approach that does not work when it is not nested...so just try and assume not nested if fails
@@ -201,21 +279,23 @@ def _map(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
                         cdm_tables[table]['atts'][cdm_key].update({'decimal_places': decimal_places})
                     else:
                         cdm_tables[table]['atts'][cdm_key].update(
-                            {'decimal_places': eval('imodel_functions.' + decimal_places)(elements)})
+                            {'decimal_places': imodel_transforms.get(decimal_places)(elements)})
 
             # think that NaN also casts floats to float64....!keep floats of lower precision to its original one
             # will convert all NaN to object type!
             # but also some numerics with values, like imma observation-value (temperatures),
             # are being returned as objects!!! pero esto qué es?
-            out_dtypes[table].update({i: table_df_i[i].dtype for i in table_df_i if
+            out_dtypes[table].update({i: table_df_i[i].dtype for i in out_dtypes[table] if
                                       table_df_i[i].dtype in properties.numpy_floats and out_dtypes[table].get(
                                           i) not in properties.numpy_floats})
-            out_dtypes[table].update({i: table_df_i[i].dtype for i in table_df_i if
+            out_dtypes[table].update({i: table_df_i[i].dtype for i in out_dtypes[table] if
                                       table_df_i[i].dtype == 'object' and out_dtypes[table].get(
                                           i) not in properties.numpy_floats})
             if 'observation_value' in table_df_i:
                 table_df_i.dropna(subset=['observation_value'], inplace=True)
-            table_df_i.to_csv(cdm_tables[table]['buffer'], header=False, index=False, mode='a')
+            cdm_tables[table]['arrays'].append(table_df_i[array_columns[table]])
+            table_df_i.to_csv(cdm_tables[table]['buffer'], columns=out_dtypes[table].keys(), header=False,
+                              index=False, mode='a')
 
     for table in cdm_tables.keys():
         # Convert dtime to object to be parsed by the reader
@@ -225,11 +305,16 @@ def _map(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
         cdm_tables[table]['data'] = pd.read_csv(cdm_tables[table]['buffer'], names=out_dtypes[table].keys(), dtype=out_dtypes[table], parse_dates=date_columns[table])
         cdm_tables[table]['buffer'].close()
         cdm_tables[table].pop('buffer')
+        arrays = cdm_tables[table].pop('arrays')
+        if array_columns[table]:
+            arrays = pd.concat(arrays).reset_index(drop=True)
+            cdm_tables[table]['data'] = pd.concat([cdm_tables[table]['data'], arrays], axis=1)[
+                list(imodel_maps[table].keys())]
 
     return cdm_tables
 
 
-def map_model(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
+def map_model(imodel, data, data_atts, cdm_subset=None, table_format='pandas', log_level='INFO'):
     """
     Calls the main mapping function _map()
 
@@ -250,6 +335,10 @@ def map_model(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
         Type: string.
     cdm_subset: subset of CDM model tables to map.
         Defaults to the full set of CDM tables defined for the imodel. Type: list.
+    table_format: format of the output tables data (requires pyarrow if not 'pandas'):
+        - 'pandas': pandas.DataFrame (default)
+        - 'arrow': pyarrow.Table with the CDM schema (see common/arrow_hdlr.py)
+        - 'pandas_arrow': pandas.DataFrame backed by Arrow arrays (pandas.ArrowDtype) with the CDM schema
     log_level: level of logging information to save.
         Defaults to ‘DEBUG’.
         Type string.
@@ -288,7 +377,22 @@ def map_model(imodel, data, data_atts, cdm_subset=None, log_level='INFO'):
         logger.error('Input data type ''{}'' not supported'.format(type(data)))
         return
 
+    if table_format not in ['pandas', 'arrow', 'pandas_arrow']:
+        logger.error('Table format ''{}'' not supported'.format(table_format))
+        return
+    elif table_format != 'pandas' and arrow_hdlr.pa is None:
+        logger.error('Table format ''{}'' requires pyarrow'.format(table_format))
+        return
+
     # Map thing:
     data_cdm = _map(imodel, data, data_atts, cdm_subset=cdm_subset, log_level=log_level)
 
+    if data_cdm and table_format == 'arrow':
+        for table in data_cdm.keys():
+            data_cdm[table]['data'] = arrow_hdlr.to_arrow_table(data_cdm[table]['data'], data_cdm[table]['atts'],
+                                                                list(data_cdm[table]['data'].columns))
+    elif data_cdm and table_format == 'pandas_arrow':
+        for table in data_cdm.keys():
+            data_cdm[table]['data'] = arrow_hdlr.to_arrow_frame(data_cdm[table]['data'], data_cdm[table]['atts'])
+
     return data_cdm
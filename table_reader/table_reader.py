@@ -9,12 +9,16 @@ All CDM fields are read as objects. Null values are read with the specified null
 in the table files, or as NaN if the na_values argument is set to the a specific null
 value in the file.
 
+With typed=True, fields are read with the dtypes of their CDM data types (lib/tables/*.json),
+and null values (null_label) as missing values.
+
 Reads the full set of files (default), a subset or a single table, as controlled
 by cdm_subset:
 
     - When reading multiple tables, the resulting dataframe is multi-indexed in
         the columns, with (table-name, field) as column names. Merging of tables
-        occurs on the report_id field.
+        occurs on the report_id field (inner, left or outer join), to a record
+        per report (wide layout) or per observation (long layout).
     - When reading a single table, the resulting dataframe has simple indexing
         in the columns.
 
@@ -37,23 +41,688 @@ with:
     tb_id: any identifier including wildcards if required
     extension: defaulting to 'psv'
 
+Compressed files (tableName-<tb_id>.<extension>.gz, .bz2 or .zst) are found
+and decompressed transparently.
+
+Tables written in shards (tableName-<tb_id>-part0001.<extension>, ...) are read
+from all their shards, as listed in their index (tableName-<tb_id>-shards.json).
+
+Tables partitioned in directories (tb_path/year=1950/month=08/.../tableName-<tb_id>.<extension>,
+with a manifest.json in tb_path, see common/partitions_hdlr.py) are read from all the
+partitions, or from those selected with param partitions (partition pruning).
+
 When specifying a subset of tables, valid names are those in properties.cdm_tables
 
 @author: iregon
 """
 
 import os
+import numpy as np
 import pandas as pd
 from cdm import properties
 from cdm.common import logging_hdlr
+from cdm.common import compression_hdlr
+from cdm.common import partitions_hdlr
+from cdm.common import arrays_hdlr
+from cdm.common import arrow_hdlr
+from cdm.common import cache_hdlr
+from cdm.common import filters_hdlr
+from cdm.common import index_hdlr
+from cdm.lib.tables import tables_hdlr
 import glob
+import json
+import re
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 
 
 module_path = os.path.dirname(os.path.abspath(__file__))
 
+# Shards of a table, as written by table_writer: tableName-<tb_id>-part0001.<extension>
+shard_file = re.compile(r'-part\d{4}\.')
+shard_index_extension = '-shards.json'
+
+# Typed reading: dtypes of the CDM data types
+typed_types = {'int': 'Int32', 'numeric': 'float64'}
+
+# Joins of multiple tables, and label of the observations tables stacked in the long layout
+join_hows = ['inner', 'left', 'outer']
+join_layouts = ['wide', 'long']
+long_observations = 'observations'
+
+# Parser engines: pandas C parser, Arrow CSV reader
+engines = ['c', 'pyarrow']
+
+# Records parsed at once when filtering: only those meeting the filters are kept
+filter_chunksize = 100000
+
+
+def find_files(pattern):
+    """
+    Gets the files matching a pattern, as is or compressed
+
+    Parameters
+    ----------
+    pattern: glob pattern of the uncompressed file names
+
+    Returns
+    -------
+    list: matching file paths
+    """
+    files = glob.glob(pattern)
+    for compression_extension in compression_hdlr.compressions.values():
+        files.extend(glob.glob(pattern + compression_extension))
+    return files
+
+
+def read_shard_index(index_path):
+    """
+    Gets the shard files of a table, from its shard index
+
+    Parameters
+    ----------
+    index_path: path of the shard index
+
+    Returns
+    -------
+    list: shard file paths, in order
+    """
+    with open(index_path) as fileObj:
+        index = json.load(fileObj)
+    return [os.path.join(os.path.dirname(index_path), x.get('file')) for x in index.get('shards')]
+
+
+def table_files(path, table, tb_id, extension, dataset=False):
+    """
+    Gets the files of a table: tableName-<tb_id>.<extension>, compressed or not,
+    or its shards
+
+    Parameters
+    ----------
+    path: directory of the files
+    table: table name
+    tb_id: identifier of the files, including wildcards if required
+    extension: file extension
+    dataset: if True, all the files matching the pattern are returned
+
+    Returns
+    -------
+    list: file paths, None if the pattern matches more than one file and not dataset
+    """
+    files = find_files(os.path.join(path, '-'.join([table, tb_id]) + '.' + extension))
+    if len(files) > 1:
+        files = [x for x in files if not shard_file.search(os.path.basename(x))]
+    indexes = sorted(glob.glob(os.path.join(path, '-'.join([table, tb_id]) + shard_index_extension)))
+    if dataset:
+        return sorted(files) + [x for index_path in indexes for x in read_shard_index(index_path)]
+    if len(files) + len(indexes) > 1:
+        return None
+    return files if len(files) == 1 else [x for index_path in indexes for x in read_shard_index(index_path)]
+
+
+def concat_records(df_list, ignore_index=False):
+    """
+    Concatenates the records of a table read in pieces (files or chunks).
+    Categorical columns, with different categories in each piece, are
+    concatenated as categorical with all the categories.
+
+    Parameters
+    ----------
+    df_list: list of pandas.Dataframe with the same columns
+    ignore_index: if True, the result has a new index
+
+    Returns
+    -------
+    pandas.Dataframe
+    """
+    df_list = [x for x in df_list if len(x) > 0] or df_list[-1:]
+    if len(df_list) == 1:
+        return df_list[0]
+    columns = df_list[0].columns
+    categories = [x for x in columns if all(x in df and isinstance(df[x].dtype, pd.CategoricalDtype)
+                                            for df in df_list)]
+    if len(categories) == 0:
+        return pd.concat(df_list, ignore_index=ignore_index, copy=False)
+    df = pd.concat([x.drop(columns=categories) for x in df_list], ignore_index=ignore_index, copy=False)
+    for x in categories:
+        df[x] = pd.Series(pd.api.types.union_categoricals([y[x] for y in df_list]), index=df.index)
+    return df[columns]
+
+
+def add_source(df, file_path, source_column):
+    """
+    Adds a categorical column with the file of the records of a pandas.Dataframe
+    """
+    df[source_column] = pd.Categorical.from_codes([0] * len(df), categories=[file_path])
+    return df
+
+
+def typed_dtypes(table_atts, categorical=None):
+    """
+    Gets the dtypes of the elements of a table, from their CDM data types:
+        - elements with a code table (code_table attribute, e.g. platform_type, quality_flag): category
+        - int: Int32 (nullable)
+        - numeric: float64
+        - varchar (identifiers and free text): object
+        - timestamp with timezone and arrays: object, converted after reading
+
+    Parameters
+    ----------
+    table_atts: attributes of the table, as in lib/tables/*.json
+    categorical: elements read as categorical, instead of the elements with a code table
+
+    Returns
+    -------
+    dict: {element: dtype}
+    """
+    if categorical is None:
+        categorical = [x for x, v in table_atts.items()
+                       if v.get('code_table') and not v.get('data_type', '').endswith('[]')]
+    dtypes = {}
+    for element, atts in table_atts.items():
+        if element in categorical:
+            dtypes[element] = 'category'
+        else:
+            dtypes[element] = typed_types.get(atts.get('data_type'), 'object')
+    return dtypes
+
+
+def to_typed(df, table_atts):
+    """
+    Converts the timestamps and arrays of a table read as text:
+    timestamps to datetime64 (UTC), arrays to lists
+
+    Parameters
+    ----------
+    df: pandas.Dataframe with the table, it is modified
+    table_atts: attributes of the table, as in lib/tables/*.json
+
+    Returns
+    -------
+    pandas.Dataframe
+    """
+    for element in df.columns:
+        data_type = table_atts.get(element, {}).get('data_type', '')
+        if isinstance(df[element].dtype, pd.CategoricalDtype) and data_type in typed_types:
+            # Categories of numbers as numbers
+            categories = df[element].cat.categories
+            df[element] = df[element].cat.rename_categories(
+                categories.astype('int64' if data_type == 'int' else 'float64'))
+        elif data_type == 'timestamp with timezone':
+            df[element] = pd.to_datetime(df[element], errors='coerce', utc=True).dt.tz_localize(None)
+        elif data_type.endswith('[]'):
+            df[element] = arrays_hdlr.from_text(df[element], data_type[:-2])
+    return df
+
+
+def read_arrow(file_path, delimiter='|', usecols=None, dtype='object', na_values=[]):
+    """
+    Reads a file of a table with the Arrow CSV reader (multithreaded), see arrow_hdlr.read_csv
+
+    Returns
+    -------
+    pandas.Dataframe, None if it cannot be read with Arrow (pyarrow not available, or file not supported)
+    """
+    if arrow_hdlr.pa_csv is None:
+        return None
+    try:
+        return arrow_hdlr.read_csv(file_path, delimiter=delimiter, usecols=usecols, dtype=dtype,
+                                   na_values=na_values)
+    except Exception:
+        return None
+
+
+def read_cached(file_path, cache, delimiter='|', usecols=None, dtype='object', na_values=[]):
+    """
+    Reads a file of a table from its Arrow IPC cache (memory-mapped), see cache_hdlr.read_cache
+
+    Returns
+    -------
+    pandas.Dataframe, None if it cannot be cached (pyarrow not available, or file not supported)
+    """
+    if cache_hdlr.pa is None:
+        return None
+    try:
+        return cache_hdlr.read_cache(file_path, cache, delimiter=delimiter, usecols=usecols, dtype=dtype,
+                                     na_values=na_values)
+    except Exception:
+        return None
+
+
+def read_file(file_path, delimiter='|', usecols=None, na_values=[], source_column=None, table_atts=None,
+              categorical=None, filters=None, filter_atts=None, engine='c', cache=None):
+    """
+    Reads a file of a table
+
+    Parameters
+    ----------
+    file_path: path of the file
+    delimiter: default is '|'
+    usecols: columns to read
+    na_values: specifies the format of NaN values
+    source_column: name of a column to add with the file path
+    table_atts: attributes of the table to read it typed, default is None (all elements as objects)
+    categorical: elements read as categorical, if typed
+    filters: list of (element, operator, value) filters of the table, see filters_hdlr.table_filters.
+        The file is parsed in chunks, and only the records meeting the filters are kept
+    filter_atts: attributes of the table, to apply the filters
+    engine: parser engine, 'c' (pandas) or 'pyarrow' (Arrow CSV reader, multithreaded).
+        Files that cannot be read with pyarrow are read with the pandas parser
+    cache: True to read the file from an Arrow IPC cache next to it, or path to a cache directory,
+        see common/cache_hdlr.py. The cache is built if there is none or if it is not valid.
+        Default is None, the file is parsed. Files that cannot be cached are parsed with the engine
+
+    Returns
+    -------
+    pandas.Dataframe
+    """
+    dtype = typed_dtypes(table_atts, categorical) if table_atts else 'object'
+    # Elements filtered are read, but only returned if requested
+    filter_columns = [x[0] for x in filters or [] if usecols is not None and x[0] not in usecols]
+    filter_columns = list(dict.fromkeys(filter_columns))
+    columns = list(usecols) + filter_columns if usecols is not None else None
+    df = None
+    if cache:
+        df = read_cached(file_path, cache, delimiter=delimiter, usecols=columns, dtype=dtype, na_values=na_values)
+    if df is None and engine == 'pyarrow':
+        df = read_arrow(file_path, delimiter=delimiter, usecols=columns, dtype=dtype, na_values=na_values)
+    if df is not None:
+        df = to_typed(df, table_atts) if table_atts else df
+        if filters:
+            df = df[filters_hdlr.filter_mask(df, filters, filter_atts)].reset_index(drop=True)
+            df = df.drop(columns=filter_columns) if filter_columns else df
+        return add_source(df, file_path, source_column) if source_column else df
+    if filters:
+        return concat_records(list(iter_file_chunks([file_path], filter_chunksize, delimiter=delimiter,
+                                                    usecols=usecols, na_values=na_values,
+                                                    source_column=source_column, table_atts=table_atts,
+                                                    categorical=categorical, filters=filters,
+                                                    filter_atts=filter_atts)), ignore_index=True)
+    df = pd.read_csv(file_path, delimiter=delimiter, usecols=usecols, dtype=dtype, na_values=na_values,
+                     keep_default_na=False)
+    df = to_typed(df, table_atts) if table_atts else df
+    return add_source(df, file_path, source_column) if source_column else df
+
+
+def read_files(file_paths, delimiter='|', usecols=None, na_values=[], n_threads=None, source_column=None,
+               tables_atts=None, categorical=None, filters=None, filter_atts=None, engine='c', cache=None):
+    """
+    Reads the files of a set of tables, concurrently with a pool of threads
+
+    Parameters
+    ----------
+    file_paths: dictionary with the {table: [file paths]} to read
+    delimiter: default is '|'
+    usecols: dictionary with the {table: columns to read}
+    na_values: specifies the format of NaN values
+    n_threads: number of threads reading files, 1 to read them one after the other.
+        Default is None, the default of concurrent.futures.ThreadPoolExecutor
+    source_column: name of a column to add with the path of the file of each record
+    tables_atts: attributes of the tables to read them typed, default is None (all elements as objects)
+    categorical: dictionary with the {table: elements read as categorical}, if typed
+    filters: dictionary with the {table: filters of the table}
+    filter_atts: attributes of the tables, to apply the filters
+    engine: parser engine, 'c' or 'pyarrow', see read_file
+    cache: True or path to a cache directory to read the files from their Arrow IPC caches, see read_file
+
+    Returns
+    -------
+    dict: {table: pandas.Dataframe with the records of all its files}
+    """
+    reads = [(tb, x) for tb, tb_files in file_paths.items() for x in tb_files]
+
+    def read(item):
+        return read_file(item[1], delimiter=delimiter, usecols=usecols.get(item[0]), na_values=na_values,
+                         source_column=source_column, table_atts=tables_atts.get(item[0]) if tables_atts else None,
+                         categorical=categorical.get(item[0]) if categorical else None,
+                         filters=filters.get(item[0]) if filters else None,
+                         filter_atts=filter_atts.get(item[0]) if filter_atts else None, engine=engine,
+                         cache=cache)
+
+    if len(reads) > 1 and n_threads != 1:
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            dfs = list(executor.map(read, reads))
+    else:
+        dfs = [read(x) for x in reads]
+    tables = {}
+    for (tb, tb_file), df in zip(reads, dfs):
+        tables.setdefault(tb, []).append(df)
+    return {tb: concat_records(df_list, ignore_index=True) for tb, df_list in tables.items()}
+
+
+def iter_file_chunks(files, chunksize, delimiter='|', usecols=None, na_values=[], source_column=None, table_atts=None,
+                     categorical=None, filters=None, filter_atts=None):
+    """
+    Reads the files of a table in chunks, one file after the other
+
+    Parameters
+    ----------
+    files: list of file paths
+    chunksize: number of records of each chunk
+    delimiter: default is '|'
+    usecols: columns to read
+    na_values: specifies the format of NaN values
+    source_column: name of a column to add with the file path
+    table_atts: attributes of the table to read it typed, default is None (all elements as objects)
+    categorical: elements read as categorical, if typed
+    filters: list of (element, operator, value) filters of the table, see filters_hdlr.table_filters.
+        Only the records meeting them are kept in the chunks
+    filter_atts: attributes of the table, to apply the filters
+
+    Yields
+    ------
+    pandas.Dataframe: chunks, indexed by the position of their records in the table
+    """
+    offset = 0
+    dtype = typed_dtypes(table_atts, categorical) if table_atts else 'object'
+    # Elements filtered are read, but only returned if requested
+    filter_columns = [x[0] for x in filters or [] if usecols is not None and x[0] not in usecols]
+    usecols = list(usecols) + list(dict.fromkeys(filter_columns)) if filter_columns else usecols
+    for file_path in files:
+        with pd.read_csv(file_path, delimiter=delimiter, usecols=usecols, dtype=dtype, na_values=na_values,
+                         keep_default_na=False, chunksize=chunksize) as reader:
+            for df in reader:
+                df = to_typed(df, table_atts) if table_atts else df
+                df.index = pd.RangeIndex(offset, offset + len(df))
+                offset += len(df)
+                if filters:
+                    df = df[filters_hdlr.filter_mask(df, filters, filter_atts)]
+                    df = df.drop(columns=list(dict.fromkeys(filter_columns))) if filter_columns else df
+                yield add_source(df, file_path, source_column) if source_column else df
+
+
+def take_reports(buffer, chunks, report_ids):
+    """
+    Takes the records of a set of reports from a table read in chunks, assuming that the
+    records are in the order of their reports (as written by table_writer).
+    Chunks are read until a record of a later report is found.
+
+    Parameters
+    ----------
+    buffer: pandas.Dataframe with the records read and not taken yet
+    chunks: iterator of the next chunks of the table
+    report_ids: pd.Series with the reports
+
+    Returns
+    -------
+    (pandas.Dataframe with the records of the reports, buffer with the records not taken)
+    """
+    taken = []
+    while True:
+        rows = buffer['report_id'].isin(report_ids).to_numpy() if len(buffer) > 0 else np.array([], dtype=bool)
+        taken.append(buffer[rows])
+        rest = buffer[~rows]
+        if len(buffer) > 0 and not rows[-1]:
+            break
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        buffer = concat_records([rest, chunk]) if len(rest) > 0 else chunk
+    return concat_records(taken), rest
+
+
+def report_codes(dfs):
+    """
+    Encodes the report_id of a set of tables to shared integer codes, in order
+    of appearance (first table first)
+
+    Parameters
+    ----------
+    dfs: dictionary with the {table: pandas.Dataframe}
+
+    Returns
+    -------
+    (dictionary with the {table: np.array of codes}, number of reports).
+    Records with no report_id have code -1
+    """
+    ids = [np.asarray(dfi['report_id'], dtype=object) for dfi in dfs.values()]
+    codes, uniques = pd.factorize(np.concatenate(ids) if len(ids) > 0 else np.array([], dtype=object))
+    return dict(zip(dfs.keys(), np.split(codes, np.cumsum([len(x) for x in ids])[:-1]))), len(uniques)
+
+
+def report_positions(codes, n_reports):
+    """
+    Gets the position of the record of each report in a table, -1 if none
+    (the last position is that of the records with no report)
+    """
+    positions = np.full(n_reports + 1, -1, dtype=np.int64)
+    valid = codes >= 0
+    positions[codes[valid]] = np.flatnonzero(valid)
+    return positions
+
+
+def duplicated_reports(codes, n_reports):
+    """
+    Checks if a table has multiple records of a report
+    """
+    valid = codes[codes >= 0]
+    return len(valid) > 0 and np.bincount(valid, minlength=n_reports).max() > 1
+
+
+def take_records(df, indexer, table):
+    """
+    Takes the records of a table by position (-1 for a missing record) to a
+    block of (table, field) columns
+    """
+    block = df.reset_index(drop=True).reindex(indexer)
+    block.index = pd.RangeIndex(len(indexer))
+    block.columns = pd.MultiIndex.from_product([[table], block.columns])
+    return block
+
+
+def join_wide(dfs, codes, n_reports, how='outer'):
+    """
+    Joins tables to a record per report, with (table-name, field) columns
+
+    Parameters
+    ----------
+    dfs: dictionary with the {table: pandas.Dataframe}, a single record per report
+    codes: dictionary with the {table: np.array of codes}, see report_codes
+    n_reports: number of reports
+    how: 'inner', 'left' (reports of the header, or of the first table) or 'outer'
+
+    Returns
+    -------
+    pandas.Dataframe
+    """
+    tables = list(dfs.keys())
+    if how == 'left':
+        reports = pd.unique(codes.get('header' if 'header' in dfs else tables[0]))
+        reports = reports[reports >= 0]
+    else:
+        counts = np.zeros(n_reports + 1, dtype=np.int64)
+        for tb in tables:
+            present = np.zeros(n_reports + 1, dtype=bool)
+            present[codes.get(tb)] = True
+            counts += present
+        reports = np.flatnonzero(counts[:-1] == len(tables) if how == 'inner' else counts[:-1] > 0)
+    return pd.concat([take_records(dfs.get(tb), report_positions(codes.get(tb), n_reports)[reports], tb)
+                      for tb in tables], axis=1)
+
+
+def join_long(dfs, codes, n_reports, how='outer'):
+    """
+    Joins tables to a record per observation, with the ('header', field) columns of its
+    report and the ('observations', field) columns of the observations tables, stacked
+
+    Parameters
+    ----------
+    dfs: dictionary with the {table: pandas.Dataframe}, a single header record per report
+    codes: dictionary with the {table: np.array of codes}, see report_codes
+    n_reports: number of reports
+    how: 'inner', 'left' (reports of the header) or 'outer'
+
+    Returns
+    -------
+    pandas.Dataframe, with the records sorted by report
+    """
+    observations = [tb for tb in dfs.keys() if tb != 'header']
+    header = dfs.get('header')
+    # Observations with no report_id are sorted last
+    row_codes = np.concatenate([codes.get(tb) for tb in observations] + [np.array([], dtype=np.int64)])
+    row_codes = np.where(row_codes < 0, n_reports, row_codes)
+    obs_index = np.arange(len(row_codes))
+    if header is not None and how != 'inner':
+        # Reports with no observations: a record with the header only
+        with_obs = np.zeros(n_reports + 1, dtype=bool)
+        with_obs[row_codes] = True
+        header_codes = codes.get('header')[codes.get('header') >= 0]
+        alone = header_codes[~with_obs[header_codes]]
+        row_codes = np.concatenate([row_codes, alone])
+        obs_index = np.concatenate([obs_index, np.full(len(alone), -1)])
+    # Sorted merge, on the report codes
+    order = np.argsort(row_codes, kind='stable')
+    row_codes = row_codes[order]
+    obs_index = obs_index[order]
+    blocks = []
+    if header is not None:
+        header_index = report_positions(codes.get('header'), n_reports)[row_codes]
+        if how != 'outer':
+            obs_index = obs_index[header_index >= 0]
+            header_index = header_index[header_index >= 0]
+        blocks.append(take_records(header, header_index, 'header'))
+    if observations:
+        stacked = concat_records([dfs.get(tb) for tb in observations], ignore_index=True)
+        blocks.append(take_records(stacked, obs_index, long_observations))
+    return pd.concat(blocks, axis=1)
+
+
+def join_tables(dfs, how='outer', layout='wide'):
+    """
+    Joins tables on their report_id.
+
+    The report_id of all the tables are encoded once to shared integer codes, and the
+    records of the tables are taken by their position in the joined records, with no
+    alignment on the report_id strings.
+
+    Parameters
+    ----------
+    dfs: dictionary with the {table: pandas.Dataframe}
+    how: 'inner' (reports in all the tables), 'left' (reports of the header, or of the first
+        table if there is no header) or 'outer' (reports in any table)
+    layout:
+        - 'wide': a record per report, with the (table-name, field) columns of all the
+            tables. Tables have to have a single record per report
+        - 'long': a record per observation, with the ('header', field) columns of its report
+            and the ('observations', field) columns of the observations tables stacked.
+            Reports with no observations have a record with their header only (left and
+            outer) and observations with no report in the header have no header (outer)
+
+    Returns
+    -------
+    pandas.Dataframe, None if a table has multiple records of a report and it has to have one
+    """
+    codes, n_reports = report_codes(dfs)
+    for tb in dfs.keys():
+        if (layout == 'wide' or tb == 'header') and duplicated_reports(codes.get(tb), n_reports):
+            return None
+    if layout == 'long':
+        return join_long(dfs, codes, n_reports, how=how)
+    return join_wide(dfs, codes, n_reports, how=how)
+
+
+def merge_tables(dfs, keep_empty=False, how='outer', layout='wide'):
+    """
+    Merges tables on their report_id, to a pandas.Dataframe with (table-name, field) columns
+
+    Parameters
+    ----------
+    dfs: dictionary with the {table: pandas.Dataframe}
+    keep_empty: if True, the columns of empty tables are kept
+    how: 'inner', 'left' or 'outer', see join_tables
+    layout: 'wide' or 'long', see join_tables
+
+    Returns
+    -------
+    pandas.Dataframe, None if all tables are empty
+    """
+    dfs = {tb: dfi for tb, dfi in dfs.items() if len(dfi) > 0 or keep_empty}
+    if len(dfs) == 0:
+        return None
+    return join_tables(dfs, how=how, layout=layout)
+
+
+def iter_aligned_chunks(file_paths, chunksize, tables=None, delimiter='|', usecols=None, na_values=[],
+                        source_column=None, tables_atts=None, categorical=None, filters=None, filter_atts=None,
+                        how='outer', layout='wide'):
+    """
+    Reads a set of tables in chunks of reports, merged on report_id.
+
+    The reports of each chunk are those of chunksize records of the header (or of the
+    first table if there is no header), and the records of the other tables are taken
+    as they are read, assuming that they are in the order of their reports (as written
+    by table_writer).
+
+    Parameters
+    ----------
+    file_paths: dictionary with the {table: [file paths]} to read
+    chunksize: number of reports of each chunk
+    tables: tables to return, defaults to those in file_paths. If the header is not
+        one of them, but is in file_paths, only its report_id is read to align the chunks
+    delimiter: default is '|'
+    usecols: dictionary with the {table: columns to read}
+    na_values: specifies the format of NaN values
+    source_column: name of a column to add with the path of the file of each record
+    tables_atts: attributes of the tables to read them typed, default is None (all elements as objects)
+    categorical: dictionary with the {table: elements read as categorical}, if typed
+    filters: dictionary with the {table: filters of the table}, see filters_hdlr.table_filters.
+        The records of the reports not meeting the filters of the header (or first table) are dropped
+    filter_atts: attributes of the tables, to apply the filters
+    how: 'inner', 'left' or 'outer' join of the tables, see join_tables
+    layout: 'wide' or 'long', see join_tables
+
+    Yields
+    ------
+    pandas.Dataframe: chunks, with (table-name, field) columns
+    """
+    tables = [x for x in file_paths.keys() if x in tables] if tables else list(file_paths.keys())
+    driver = 'header' if 'header' in file_paths else tables[0]
+    filters = filters if filters else {}
+    driver_filters = filters.get(driver)
+    usecols = dict(usecols, header=['report_id']) if driver not in tables else dict(usecols)
+    # The driver is read unfiltered to align the other tables, and filtered then
+    driver_columns = []
+    if driver_filters and usecols.get(driver) is not None:
+        driver_columns = [x for x in dict.fromkeys(x[0] for x in driver_filters) if x not in usecols.get(driver)]
+        usecols[driver] = list(usecols.get(driver)) + driver_columns
+    chunks = {tb: iter_file_chunks(file_paths.get(tb), chunksize, delimiter=delimiter, usecols=usecols.get(tb),
+                                   na_values=na_values, source_column=source_column if tb in tables else None,
+                                   table_atts=tables_atts.get(tb) if tables_atts else None,
+                                   categorical=categorical.get(tb) if categorical else None,
+                                   filters=filters.get(tb) if tb != driver else None,
+                                   filter_atts=filter_atts.get(tb) if filter_atts else None)
+              for tb in file_paths.keys()}
+    buffers = {tb: pd.DataFrame(columns=['report_id']) for tb in tables if tb != driver}
+    for chunk in chunks.get(driver):
+        dfs = {}
+        for tb in buffers.keys():
+            dfs[tb], buffers[tb] = take_reports(buffers.get(tb), chunks.get(tb), chunk['report_id'])
+        if driver_filters:
+            chunk = chunk[filters_hdlr.filter_mask(chunk, driver_filters, filter_atts.get(driver))]
+            chunk = chunk.drop(columns=driver_columns) if driver_columns else chunk
+            for tb in buffers.keys():
+                dfs[tb] = dfs.get(tb)[dfs.get(tb)['report_id'].isin(chunk['report_id']).to_numpy()]
+        dfs[driver] = chunk
+        merged = merge_tables({tb: dfs.get(tb) for tb in tables}, keep_empty=True, how=how, layout=layout)
+        if merged is None:
+            raise ValueError('Multiple records of a report in a table, cannot join them in a wide layout')
+        if driver not in tables:
+            # Reports with no records in the tables read
+            merged = merged[merged.notna().any(axis=1).to_numpy()].reset_index(drop=True)
+        if len(merged) > 0:
+            yield merged
+    # Records with no report, none meets the filters of the reports
+    if driver_filters or how != 'outer':
+        return
+    dfs = {tb: concat_records([buffers.get(tb)] + list(chunks.get(tb))) for tb in buffers.keys()}
+    if any(len(x) > 0 for x in dfs.values()):
+        yield merge_tables(dfs, keep_empty=True, how=how, layout=layout)
+
 
 def read_tables(tb_path, tb_id, cdm_subset=None, delimiter='|',
-                extension='psv', col_subset=None, log_level='INFO', na_values=[]):
+                extension='psv', col_subset=None, log_level='INFO', na_values=[], partitions=None, dataset=False,
+                n_threads=None, source_column=None, chunksize=None, typed=False, null_label='null',
+                categorical=None, filters=None, how='outer', layout='wide', engine='c', cache=None):
     """
     Reads CDM table like files from file system to a pandas data frame.
 
@@ -62,7 +731,8 @@ def read_tables(tb_path, tb_id, cdm_subset=None, delimiter='|',
     tb_path:
         path to the file
     tb_id:
-        any identifier including wildcards if required extension, defaulting to 'psv'
+        any identifier including wildcards if required extension, defaulting to 'psv'.
+        A list of identifiers reads the files of all of them (dataset mode)
     cdm_subset: specifies a subset of tables or a single table.
             - For multiple subsets of tables: This option will return a pandas.Dataframe that is multi-index at
             the columns, with (table-name, field) as column names. Tables are merged via the report_id field.
@@ -80,23 +750,108 @@ def read_tables(tb_path, tb_id, cdm_subset=None, delimiter='|',
                 This variable assumes that the column names are all conform to the cdm field names in lib.tables/*.json
     log_level: Level of logging messages to save
     na_values: specifies the format of NaN values
+    partitions: partitions to read, when tb_path has partitioned tables:
+            - a dictionary with {key: value or list of values}, e.g. ``partitions = {'year': 1950, 'month': [1, 2]}``
+            - a function of the dictionary with the {key: value} of a partition, returning True to read it
+            Default is None, all partitions are read
+    dataset: if True, all the files of a table matching tb_id are read and concatenated.
+            Default is False, tb_id has to match a single file per table. Set if tb_id is a list
+    n_threads: number of threads reading the files concurrently, 1 to read them one after the other.
+            Default is None, the default of concurrent.futures.ThreadPoolExecutor
+    source_column: name of a column to add with the path of the file of each record (categorical).
+            Default is None, not added
+    chunksize: if set, returns an iterator of pandas.Dataframe chunks instead of a single pandas.Dataframe:
+            - For a single table: chunks of chunksize records.
+            - For multiple tables: chunks of chunksize reports (header records), each with the records of
+            the other tables for the same reports. Records of the other tables with no report in the
+            header are in a last chunk.
+            Files are read one after the other. Default is None, the tables are fully read
+    typed: if True, the elements are read with the dtypes of their CDM data types (lib/tables/*.json),
+            instead of as objects: int as Int32 (nullable), numeric as float64, timestamps as datetime64
+            (UTC), varchar as object and arrays as lists. Elements with a code table in the table
+            definitions (e.g. platform_type, observed_variable, quality_flag) are read as category.
+            Values equal to null_label are missing values
+    null_label: missing values label in the files, if typed. Default is 'null'
+    categorical: elements read as categorical, if typed, instead of the elements with a code table:
+            a list for a single table, or a dictionary like ``categorical = {table0:[columns],...}``
+    filters: list of (element, operator, value) filters the records read have to meet, e.g.
+            ``filters = [('date_time', '>=', '1950-01-01'), ('latitude', 'between', (-10, 10)),
+            ('quality_flag', 'in', [0])]``, see common/filters_hdlr.py. Elements are given by name
+            (filter of all the tables with it) or as (table, element). Records are filtered as the
+            files are parsed, and, in partitioned tables, partitions with no records meeting the filters
+            on time elements or partition keys are not read. The filters of the header select the reports
+            of the records of all the tables. Default is None, all records are read
+    how: join of multiple tables on their reports: 'inner' (reports in all the tables), 'left' (reports
+            of the header) or 'outer' (reports in any table, default)
+    layout: layout of multiple tables:
+            - 'wide' (default): a record per report, with the (table-name, field) columns of all the tables
+            - 'long': a record per observation, with the ('header', field) columns of its report and the
+            ('observations', field) columns of the observations tables, stacked. Reports with no
+            observations have a record with their header only (left and outer joins)
+    engine: parser engine: 'c' (pandas parser, default) or 'pyarrow' (Arrow CSV reader, parsing blocks of
+            each file with multiple threads). Files that cannot be read with pyarrow (or if it is not available)
+            are read with the pandas parser. Chunked reads (chunksize) use the pandas parser
+    cache: if True, each file is cached to an Arrow IPC file next to it (<file name>.arrow), or to the
+            cache directory given, and read from it, memory-mapped, instead of parsed. Caches are built
+            the first time a file is read, and again when the file changes (size, modification time or
+            hash of its first and last blocks), see common/cache_hdlr.py. Only the columns read are
+            converted. Files that cannot be cached (or if pyarrow is not available) are parsed with
+            the engine. Chunked reads (chunksize) do not use the cache. Default is None, no cache
 
     Returns
     -------
-    pandas.Dataframe: either the entire file or a subset of it.
+    pandas.Dataframe: either the entire file or a subset of it, or an iterator of chunks if chunksize is set.
     logger.error: logs specific messages if there is any error.
     """
     logger = logging_hdlr.init_logger(__name__, level=log_level)
-    # Because how the printers are written, they modify the original data frame!,
-    # also removing rows with empty observation_value in observation_tables
     if not os.path.isdir(tb_path):
         logger.error('Data path not found {}: '.format(tb_path))
         return
 
+    if filters:
+        error = filters_hdlr.check_filters(filters)
+        if error:
+            logger.error(error)
+            return
+    if engine not in engines:
+        logger.error('Engine {0} not supported, supported are {1}'.format(engine, ",".join(engines)))
+        return
+    if cache and cache is not True and os.path.isfile(cache):
+        logger.error('Cache directory {} is a file'.format(cache))
+        return
+    if cache and cache_hdlr.pa is None:
+        logger.warning('Cache requires pyarrow, not available: files are parsed')
+    if how not in join_hows or layout not in join_layouts:
+        logger.error('Join {0} in {1} layout not supported, supported are {2} and {3} layouts'.format(
+            how, layout, ",".join(join_hows), ",".join(join_layouts)))
+        return
+
+    # Partitioned tables: directories of the selected partitions
+    manifest = partitions_hdlr.read_manifest(tb_path)
+    if manifest:
+        if isinstance(partitions, dict):
+            for key in partitions.keys():
+                if key not in manifest.get('partition_by'):
+                    logger.error('Tables not partitioned by {}'.format(key))
+                    return
+        selected = partitions_hdlr.select_partitions(manifest, partitions)
+        selected = filters_hdlr.prune_partitions(selected, filters) if filters else selected
+        tb_paths = [os.path.join(tb_path, x.get('path')) for x in selected]
+        logger.info('Reading {0} of {1} partitions'.format(len(tb_paths), len(manifest.get('partitions'))))
+    elif partitions:
+        logger.error('No partitioned tables in {}'.format(tb_path))
+        return
+    else:
+        tb_paths = [tb_path]
+
+    tb_ids = tb_id if isinstance(tb_id, list) else [tb_id]
+    dataset = dataset or isinstance(tb_id, list)
+
     # See if theres anything at all:
-    files = glob.glob(os.path.join(tb_path, '*' + tb_id + '*.' + extension))
+    files = [x for path in tb_paths for tb_idi in tb_ids
+             for x in find_files(os.path.join(path, '*' + tb_idi + '*.' + extension))]
     if len(files) == 0:
-        logger.error('No files found matching pattern {}'.format(tb_id))
+        logger.error('No files found matching pattern {}'.format(','.join(tb_ids)))
         return
 
         # See if subset, if any of the tables is not as specs
@@ -107,22 +862,37 @@ def read_tables(tb_path, tb_id, cdm_subset=None, delimiter='|',
                 return
 
     tables = properties.cdm_tables if not cdm_subset else cdm_subset
-    file_patterns = {tb: os.path.join(tb_path, '-'.join([tb, tb_id]) + '.' + extension) for tb in tables}
-    file_paths = {}
-    for k, v in file_patterns.items():
-        logger.info('Getting file path for pattern {}'.format(v))
-        file_path = glob.glob(v)
-        if len(file_path) == 1:
-            file_paths[k] = file_path[0]
-        elif len(file_path) > 1:
-            logger.error(
-                'Pattern {0} resulted in multiple files for table {1}. '
-                'Cannot seccurely retrieve cdm table(s)'.format(tb_id, k))
+    tb_filters = {}
+    if filters:
+        filter_atts = tables_hdlr.load_tables(log_level=log_level)
+        if filter_atts is None:
             return
+        for tb in set(tables + ['header']):
+            tb_filters[tb] = filters_hdlr.table_filters(filters, tb, filter_atts.get(tb))
+        tb_filters = {tb: x for tb, x in tb_filters.items() if len(x) > 0}
+    # Chunks of multiple tables are aligned on the reports of the header, also if not read,
+    # and the filters of the header select the reports of the other tables
+    read_header = (chunksize and len(tables) > 1) or 'header' in tb_filters
+    search_tables = tables + ['header'] if read_header and 'header' not in tables else tables
+    file_paths = {}
+    for path in tb_paths:
+        for tb_idi in tb_ids:
+            for k in search_tables:
+                logger.info('Getting file path for pattern {}'.format(
+                    os.path.join(path, '-'.join([k, tb_idi]) + '.' + extension)))
+                file_path = table_files(path, k, tb_idi, extension, dataset=dataset)
+                if file_path is None:
+                    logger.error(
+                        'Pattern {0} resulted in multiple files for table {1}. '
+                        'Cannot seccurely retrieve cdm table(s)'.format(tb_idi, k))
+                    return
+                if len(file_path) > 0:
+                    file_paths.setdefault(k, []).extend(x for x in file_path if x not in file_paths.get(k, []))
 
-    if len(file_paths) == 0:
-        logger.error(
-            'No cdm table files found for search patterns {0}: '.format(','.join(list(file_patterns.values()))))
+    if len([x for x in file_paths.keys() if x in tables]) == 0:
+        logger.error('No cdm table files found for search patterns {0}: '.format(
+            ','.join([os.path.join(tb_path, '-'.join([tb, tb_idi]) + '.' + extension)
+                      for tb in tables for tb_idi in tb_ids])))
         return
 
     usecols = None if len(tables) == 1 else {table: None for table in tables}
@@ -142,28 +912,387 @@ def read_tables(tb_path, tb_id, cdm_subset=None, delimiter='|',
             else:
                 usecols = {table: col_subset.get(table, None) for table in tables}
 
-    logger.info('Reading into dataframe data files {}: '.format(','.join(list(file_paths.values()))))
+    logger.info('Reading into dataframe data files {}: '.format(
+        ','.join([x for tb_files in file_paths.values() for x in tb_files])))
+    usecols = usecols if len(tables) > 1 else {tables[0]: usecols}
+    tables_atts = None
+    if typed:
+        tables_atts = tables_hdlr.load_tables(log_level=log_level)
+        if tables_atts is None:
+            return
+        na_values = list(na_values) + [null_label]
+        if categorical is not None and not isinstance(categorical, dict):
+            categorical = {tb: categorical for tb in tables}
+    # A single table filtered on the header needs its report_id, returned only if requested
+    single = tables[0] if len(tables) == 1 and 'header' in file_paths and tables[0] != 'header' else None
+    single_columns = usecols.get(single) if single else None
+    if single_columns is not None and 'report_id' not in single_columns:
+        usecols[single] = list(single_columns) + ['report_id']
+    if chunksize:
+        if len(tables) == 1 and not single:
+            return iter_file_chunks(file_paths.get(tables[0]), chunksize, delimiter=delimiter,
+                                    usecols=usecols.get(tables[0]), na_values=na_values, source_column=source_column,
+                                    table_atts=tables_atts.get(tables[0]) if typed else None,
+                                    categorical=categorical.get(tables[0]) if categorical else None,
+                                    filters=tb_filters.get(tables[0]), filter_atts=filter_atts.get(tables[0])
+                                    if filters else None)
+        chunks = iter_aligned_chunks(file_paths, chunksize, tables=tables, delimiter=delimiter, usecols=usecols,
+                                     na_values=na_values, source_column=source_column, tables_atts=tables_atts,
+                                     categorical=categorical, filters=tb_filters,
+                                     filter_atts=filter_atts if filters else None, how=how, layout=layout)
+        if single:
+            columns = single_columns + ([source_column] if source_column else []) if single_columns else None
+            return (x[single][columns] if columns else x[single] for x in chunks)
+        return chunks
+
+    if 'header' in file_paths and 'header' not in tables:
+        usecols['header'] = ['report_id']
+    dfs = read_files(file_paths, delimiter=delimiter, usecols=usecols, na_values=na_values, n_threads=n_threads,
+                     source_column=source_column, tables_atts=tables_atts,
+                     categorical=categorical, filters=tb_filters, filter_atts=filter_atts if filters else None,
+                     engine=engine, cache=cache)
+    if 'header' in tb_filters:
+        # Records of the reports meeting the filters of the header
+        for tb in dfs.keys():
+            if tb != 'header':
+                rows = dfs.get(tb)['report_id'].isin(dfs.get('header')['report_id']).to_numpy()
+                dfs[tb] = dfs.get(tb)[rows].reset_index(drop=True)
+        dfs = {tb: dfs.get(tb) for tb in tables if tb in dfs}
     if len(tables) == 1:
-        file_path = list(file_paths.values())[0]
-        return pd.read_csv(file_path, delimiter=delimiter, usecols=usecols,
-                           dtype='object', na_values=na_values, keep_default_na=False)
+        df = list(dfs.values())[0]
+        if single_columns is not None:
+            df = df[single_columns + ([source_column] if source_column else [])]
+        return df
     else:
-        df_list = []
-        for tb, tb_file in file_paths.items():
-            dfi = pd.read_csv(tb_file, delimiter=delimiter,
-                              usecols=usecols.get(tb), dtype='object',
-                              na_values=na_values, keep_default_na=False)
-            if len(dfi) > 0:
-                dfi.set_index('report_id', inplace=True, drop=False)
-                dfi.columns = pd.MultiIndex.from_product([[tb], dfi.columns])
-                df_list.append(dfi)
-            else:
+        for tb, dfi in dfs.items():
+            if len(dfi) == 0:
                 logger.warning('Table {} empty in file system, not added to the final DF'.format(tb))
-
-        if len(df_list) > 0:
-            merged = pd.concat(df_list, axis=1, join='outer')
-            merged.reset_index(drop=True, inplace=True)
-            return merged
-        else:
+        if all(len(dfi) == 0 for dfi in dfs.values()):
             logger.error('All tables empty in file system')
             return
+        merged = merge_tables(dfs, how=how, layout=layout)
+        if merged is None:
+            logger.error('Multiple records of a report in a table, cannot join them in a wide layout')
+        return merged
+
+
+def stack_observations(df, header_columns=None):
+    """
+    Gets the observations of tables read in a long layout as a single table,
+    with the header_columns of their report, and report_id as categorical
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        observations = df[long_observations]
+        # Records of reports with no observations
+        rows = observations.notna().any(axis=1).to_numpy()
+        observations = observations[rows].reset_index(drop=True)
+        for x in (header_columns or []):
+            if x not in observations:
+                observations[x] = df[('header', x)][rows].to_numpy()
+    else:
+        observations = df.reset_index(drop=True)
+    if 'report_id' in observations and not isinstance(observations['report_id'].dtype, pd.CategoricalDtype):
+        codes, uniques = pd.factorize(observations['report_id'])
+        observations['report_id'] = pd.Categorical.from_codes(codes, categories=uniques)
+    return observations
+
+
+def read_observations(tb_path, tb_id, cdm_subset=None, col_subset=None, header_columns=None, delimiter='|',
+                      extension='psv', log_level='INFO', na_values=[], partitions=None, dataset=False,
+                      n_threads=None, source_column=None, chunksize=None, typed=False, null_label='null',
+                      filters=None, engine='c', cache=None):
+    """
+    Reads the observations tables from file system to a single pandas data frame, in long format:
+    a record per observation, with the observed variable in observed_variable.
+
+    The records of the observations tables are stacked as they are read (see read_tables, layout='long'),
+    sorted by report, with report_id as categorical, and the header elements in header_columns of their
+    report added.
+
+    Parameters
+    ----------
+    tb_path:
+        path to the file
+    tb_id:
+        any identifier including wildcards if required extension, see read_tables
+    cdm_subset: observations tables to read. Default is None, all the observations tables
+    col_subset: list of the fields of the observations tables to read. report_id and observed_variable
+            are always read. Default is None, all fields
+    header_columns: list of the header fields to add to the observations of each report. Fields of the
+            observations tables too (e.g. latitude) are not added. Default is None, none added
+    delimiter, extension, log_level, na_values, partitions, dataset, n_threads, source_column, chunksize,
+    typed, null_label, filters, engine, cache:
+            see read_tables
+
+    Returns
+    -------
+    pandas.Dataframe, or an iterator of chunks if chunksize is set.
+    logger.error: logs specific messages if there is any error.
+    """
+    logger = logging_hdlr.init_logger(__name__, level=log_level)
+    observations = cdm_subset if cdm_subset else [x for x in properties.cdm_tables if x != 'header']
+    for tb in observations:
+        if tb not in properties.cdm_tables or tb == 'header':
+            logger.error('Requested table {} not an observations table of the CDM'.format(tb))
+            return
+    if col_subset is not None and not isinstance(col_subset, list):
+        logger.error('Column subset (col_subset) has to be declared as a list')
+        return
+    if header_columns is not None and not isinstance(header_columns, list):
+        logger.error('Header columns (header_columns) have to be declared as a list')
+        return
+
+    columns = list(dict.fromkeys(['report_id', 'observed_variable'] + col_subset)) if col_subset else None
+    tables = (['header'] if header_columns else []) + observations
+    if len(tables) == 1:
+        usecols = columns
+    else:
+        usecols = {tb: columns for tb in observations}
+        if header_columns:
+            usecols['header'] = list(dict.fromkeys(['report_id'] + header_columns))
+    df = read_tables(tb_path, tb_id, cdm_subset=tables, delimiter=delimiter, extension=extension,
+                     col_subset=usecols, log_level=log_level, na_values=na_values, partitions=partitions,
+                     dataset=dataset, n_threads=n_threads, source_column=source_column, chunksize=chunksize,
+                     typed=typed, null_label=null_label, filters=filters, how='outer', layout='long',
+                     engine=engine, cache=cache)
+    if df is None:
+        return
+    if chunksize:
+        return (stack_observations(x, header_columns) for x in df)
+    return stack_observations(df, header_columns)
+
+
+def table_indexes(tb_path, table, tb_id, element):
+    """
+    Finds the indexes of the files of a table by an element, see common/index_hdlr.py
+
+    Returns
+    -------
+    list: roots of the index files
+    """
+    pattern = os.path.join(tb_path, '-'.join([table, tb_id, element]) + index_hdlr.index_extension + '.json')
+    return sorted(x[:-len('.json')] for x in glob.glob(pattern))
+
+
+def read_indexed(index_roots, values, delimiter='|', usecols=None, na_values=[], table_atts=None,
+                 categorical=None):
+    """
+    Reads the records of a table with a set of values of an indexed element, seeking them
+    in the files with the indexes
+
+    Parameters
+    ----------
+    index_roots: roots of the index files, see table_indexes
+    values: list of values of the element
+    delimiter, usecols, na_values, table_atts, categorical: see read_file
+
+    Returns
+    -------
+    pandas.Dataframe, records in the order of the files
+    """
+    dfs = []
+    for root in index_roots:
+        index, description = index_hdlr.read_index(root)
+        entries = index_hdlr.lookup(index, values)
+        files = description.get('files')
+        for file_id in pd.unique(entries['file']):
+            rows = entries[entries['file'] == file_id]
+            data = index_hdlr.read_records(os.path.join(os.path.dirname(root), files[file_id]), rows['offset'],
+                                           rows['length'])
+            dfs.append(read_file(BytesIO(data), delimiter=delimiter, usecols=usecols, na_values=na_values,
+                                 table_atts=table_atts, categorical=categorical))
+        if len(dfs) == 0 and len(files) > 0:
+            # No records: an empty table with the columns of the files
+            dfs.append(read_file(BytesIO(index_hdlr.read_records(os.path.join(os.path.dirname(root), files[0]),
+                                                                 [], [])), delimiter=delimiter, usecols=usecols,
+                                 na_values=na_values, table_atts=table_atts, categorical=categorical))
+    return concat_records(dfs, ignore_index=True) if len(dfs) > 0 else pd.DataFrame()
+
+
+def read_reports(tb_path, tb_id, report_ids, cdm_subset=None, delimiter='|', col_subset=None, log_level='INFO',
+                 na_values=[], typed=False, null_label='null', categorical=None):
+    """
+    Reads the records of a set of reports from file system to a pandas data frame, seeking them in the files
+    with the report_id indexes of the tables (written with cdm_to_ascii, index_by=['report_id']), with no
+    parsing of the full files.
+
+    Parameters
+    ----------
+    tb_path:
+        path to the files
+    tb_id:
+        any identifier including wildcards if required, the records are searched in the files of all the
+        identifiers matching it
+    report_ids:
+        list of the report_id of the reports to read
+    cdm_subset, delimiter, col_subset, log_level, na_values, typed, null_label, categorical:
+            see read_tables
+
+    Returns
+    -------
+    pandas.Dataframe: the records of the reports, in the order of the files, with (table-name, field)
+    columns for multiple tables, as in read_tables.
+    logger.error: logs specific messages if there is any error.
+    """
+    logger = logging_hdlr.init_logger(__name__, level=log_level)
+    if not os.path.isdir(tb_path):
+        logger.error('Data path not found {}: '.format(tb_path))
+        return
+    if cdm_subset:
+        for tb in cdm_subset:
+            if tb not in properties.cdm_tables:
+                logger.error('Requested table {} not defined in CDM'.format(tb))
+                return
+    tables = properties.cdm_tables if not cdm_subset else cdm_subset
+    if col_subset and len(tables) == 1 and not isinstance(col_subset, list):
+        logger.error('Column subset (col_subset) has to be declared as a list')
+        return
+    if col_subset and len(tables) > 1 and not isinstance(col_subset, dict):
+        logger.error('Column subset (col_subset) has to be declared as a dictionary '
+                     'with a table:[columns] pair per table to subset')
+        return
+    usecols = {tables[0]: col_subset} if len(tables) == 1 else dict(col_subset or {})
+    tables_atts = None
+    if typed:
+        tables_atts = tables_hdlr.load_tables(log_level=log_level)
+        if tables_atts is None:
+            return
+        na_values = list(na_values) + [null_label]
+        if categorical is not None and not isinstance(categorical, dict):
+            categorical = {tb: categorical for tb in tables}
+
+    dfs = {}
+    for tb in tables:
+        index_roots = table_indexes(tb_path, tb, tb_id, 'report_id')
+        if len(index_roots) == 0:
+            logger.warning('No report_id index of table {0} for pattern {1}'.format(tb, tb_id))
+            continue
+        dfs[tb] = read_indexed(index_roots, report_ids, delimiter=delimiter, usecols=usecols.get(tb),
+                               na_values=na_values, table_atts=tables_atts.get(tb) if typed else None,
+                               categorical=categorical.get(tb) if categorical else None)
+    if len(dfs) == 0:
+        logger.error('No report_id indexes found for pattern {}'.format(tb_id))
+        return
+    if len(tables) == 1:
+        return dfs.get(tables[0])
+    merged = merge_tables(dfs, keep_empty=True)
+    if merged is None:
+        logger.error('Multiple records of a report in a table, cannot join them in a wide layout')
+    return merged
+
+
+def index_tables(tb_path, tb_id, index_by=['report_id'], cdm_subset=None, delimiter='|', extension='psv',
+                 null_label='null', log_level='INFO'):
+    """
+    Indexes the records of tables already written by a set of elements, to read them with read_reports
+    and read_station. Files are indexed as cdm_to_ascii does with index_by: an index per table file (or per
+    table, for tables written in shards), see common/index_hdlr.py.
+
+    Parameters
+    ----------
+    tb_path:
+        path to the files
+    tb_id:
+        any identifier including wildcards if required, all the files matching it are indexed
+    index_by:
+        list of elements to index the records by, in the tables with them.
+        Default is ['report_id']. Use ['report_id', 'primary_station_id'] for read_station
+    cdm_subset:
+        tables to index. Default is None, all tables
+    delimiter:
+        default is '|'
+    extension:
+        default is psv. Only uncompressed files are indexed
+    null_label:
+        missing values label in the files, not indexed
+    log_level:
+        Level of logging messages to save
+
+    Returns
+    -------
+    Saves the indexes next to the table files.
+    logger.error: logs specific messages if there is any error.
+    """
+    logger = logging_hdlr.init_logger(__name__, level=log_level)
+    if not os.path.isdir(tb_path):
+        logger.error('Data path not found {}: '.format(tb_path))
+        return
+    tables = properties.cdm_tables if not cdm_subset else cdm_subset
+    for tb in tables:
+        pattern = os.path.join(tb_path, '-'.join([tb, tb_id]))
+        # Files of the table: each file, or the shards of each shard index
+        groups = [(x[:-len(extension) - 1], [x]) for x in sorted(glob.glob(pattern + '.' + extension))
+                  if not shard_file.search(os.path.basename(x))]
+        groups += [(x[:-len(shard_index_extension)], read_shard_index(x))
+                   for x in sorted(glob.glob(pattern + shard_index_extension))]
+        for root, files in groups:
+            columns = pd.read_csv(files[0], delimiter=delimiter, nrows=0).columns
+            roots = {x: index_hdlr.index_root(root, x) for x in index_by if x in columns}
+            if len(roots) == 0:
+                continue
+            logger.info('Indexing {0} by {1}'.format(root, ",".join(roots.keys())))
+            for index_root in roots.values():
+                index_hdlr.remove_index(index_root)
+            error = None
+            for file_path in files:
+                error = index_hdlr.index_file(file_path, roots, delimiter=delimiter, null_label=null_label)
+                if error:
+                    break
+            if error:
+                logger.error(error)
+                for index_root in roots.values():
+                    index_hdlr.remove_index(index_root)
+                continue
+            for element, index_root in roots.items():
+                index_hdlr.write_index(index_root, element)
+
+
+def read_station(tb_path, tb_id, station_id, time_range=None, cdm_subset=None, delimiter='|', col_subset=None,
+                 log_level='INFO', na_values=[], typed=False, null_label='null', categorical=None):
+    """
+    Reads the records of the reports of a station (primary_station_id) from file system to a pandas data frame.
+    The reports are found with the primary_station_id index of the header, and their records read with the
+    report_id indexes of the tables (see read_reports), with no parsing of the full files. The indexes are
+    written with cdm_to_ascii (index_by=['report_id', 'primary_station_id']) or index_tables.
+
+    Parameters
+    ----------
+    tb_path:
+        path to the files
+    tb_id:
+        any identifier including wildcards if required, e.g. '*' for the reports in all the files
+    station_id:
+        primary_station_id of the station
+    time_range:
+        (start, end) of the report_timestamp of the reports to read, both included, None for no limit.
+        Default is None, all the reports of the station
+    cdm_subset, delimiter, col_subset, log_level, na_values, typed, null_label, categorical:
+            see read_tables
+
+    Returns
+    -------
+    pandas.Dataframe: the records of the reports, in the order of the files, with (table-name, field)
+    columns for multiple tables, as in read_tables.
+    logger.error: logs specific messages if there is any error.
+    """
+    logger = logging_hdlr.init_logger(__name__, level=log_level)
+    if not os.path.isdir(tb_path):
+        logger.error('Data path not found {}: '.format(tb_path))
+        return
+    index_roots = table_indexes(tb_path, 'header', tb_id, 'primary_station_id')
+    if len(index_roots) == 0:
+        logger.error('No primary_station_id index of the header for pattern {}'.format(tb_id))
+        return
+    header = read_indexed(index_roots, [station_id], delimiter=delimiter,
+                          usecols=['report_id', 'report_timestamp'], na_values=na_values)
+    if time_range and len(header) > 0:
+        header_atts = tables_hdlr.load_tables(log_level=log_level)
+        if header_atts is None:
+            return
+        filters = [x for x in [('report_timestamp', '>=', time_range[0]), ('report_timestamp', '<=', time_range[1])]
+                   if x[2] is not None]
+        header = header[filters_hdlr.filter_mask(header, filters, header_atts.get('header'))]
+    report_ids = list(header['report_id']) if len(header) > 0 else []
+    return read_reports(tb_path, tb_id, report_ids, cdm_subset=cdm_subset, delimiter=delimiter,
+                        col_subset=col_subset, log_level=log_level, na_values=na_values, typed=typed,
+                        null_label=null_label, categorical=categorical)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exports tables written in the C3S Climate Data Store Common Data Model (CDM) format to Apache Parquet files.
+
+The Parquet schema comes from the CDM table definitions (lib/tables/*.json), see common/arrow_hdlr.py:
+CDM data types are mapped to Arrow types and the element attributes (data_type, decimal_places...) are
+stored as field metadata. Code and text elements are dictionary encoded.
+
+Tables can be written in chunks: each chunk is written as one (or more) row groups.
+
+Requires pyarrow.
+"""
+
+import os
+from cdm.common import logging_hdlr
+from cdm.common import arrow_hdlr
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+class table_parquet_writer():
+    """
+    Writes a cdm table to a parquet file, chunk by chunk.
+
+    Records with no observation value are not written, as in the ascii
+    tables. If no chunk has observation values, an empty table is
+    written when the writer is closed.
+
+    Parameters
+    ----------
+    table_atts: attributes of the table stored as a python dictionary.
+            This contains all element names, characteristics and types encoding,
+            as well as other characteristics e.g. decimal places, etc.
+    filename:
+        the name of the file to stored the data
+    cdm_complete: if we export all the elements of the table.
+        Otherwise, the elements in the first chunk written. Default is ``True``
+    compression:
+        parquet compression codec, default is 'snappy'
+    row_group_size:
+        maximum number of rows in each row group, defaults to the rows in each chunk
+    log_level:
+        level of logging information to be saved
+    """
+
+    def __init__(self, table_atts, filename, cdm_complete=True, compression='snappy', row_group_size=None,
+                 log_level='INFO'):
+        self.table_atts = table_atts
+        self.filename = filename
+        self.cdm_complete = cdm_complete
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.log_level = log_level
+        self.columns = None
+        self.writer = None
+
+    def open(self, columns):
+        self.columns = columns
+        self.writer = pq.ParquetWriter(self.filename, arrow_hdlr.cdm_schema(self.table_atts, columns),
+                                       compression=self.compression,
+                                       use_dictionary=arrow_hdlr.dictionary_columns(self.table_atts, columns))
+
+    def write(self, table):
+        """
+        Converts a chunk of the table to Arrow and writes it to the file
+
+        Parameters
+        ----------
+        table: pandas.DataFrame with the chunk to write, or a pyarrow.Table. It is not modified.
+        """
+        is_arrow = isinstance(table, pa.Table)
+        columns = table.column_names if is_arrow else list(table.columns)
+        if 'observation_value' in columns:
+            if is_arrow:
+                rows = pc.is_valid(table.column('observation_value'))
+                table = table if pc.all(rows).as_py() else table.filter(rows)
+            else:
+                rows = table['observation_value'].notna().to_numpy()
+                table = table if rows.all() else table[rows]
+        elif 'observation_value' in self.table_atts.keys():
+            return
+        if len(table) == 0:
+            return
+        if self.writer is None:
+            self.open([x for x in self.table_atts.keys() if x in columns] if not self.cdm_complete
+                      else list(self.table_atts.keys()))
+        self.writer.write_table(arrow_hdlr.to_arrow_table(table, self.table_atts, self.columns),
+                                row_group_size=self.row_group_size)
+
+    def close(self):
+        """
+        Closes the file: writes an empty table if no observation values have been written
+        """
+        if self.writer is None:
+            logger = logging_hdlr.init_logger(__name__, level=self.log_level)
+            logger.warning('No observation values in table')
+            self.open(list(self.table_atts.keys()))
+        self.writer.close()
+
+
+def table_to_parquet(table, table_atts, filename, cdm_complete=True, compression='snappy', row_group_size=None,
+                     log_level='INFO'):
+    """
+    Exports a cdm table to a parquet file.
+
+    Parameters
+    ----------
+    table:
+        pandas.Dataframe or pyarrow.Table to export, or an iterable of chunks
+        (e.g. ``pd.io.parsers.TextFileReader``) that are written one after the other
+    table_atts: attributes of the pandas.Dataframe stored as a python dictionary.
+    filename:
+        the name of the file to stored the data
+    cdm_complete: if we export all the elements of the table.
+        default is ``True``
+    compression:
+        parquet compression codec, default is 'snappy'
+    row_group_size:
+        maximum number of rows in each row group, defaults to the rows in each chunk
+    log_level:
+        level of logging information to be saved
+
+    Returns
+    -------
+    Saves the cdm table as a parquet file
+    """
+    logger = logging_hdlr.init_logger(__name__, level=log_level)
+    if pq is None:
+        logger.error('Writing parquet files requires pyarrow')
+        return
+    writer = table_parquet_writer(table_atts, filename, cdm_complete=cdm_complete, compression=compression,
+                                  row_group_size=row_group_size, log_level=log_level)
+    for chunk in ([table] if arrow_hdlr.is_table(table) else table):
+        writer.write(chunk)
+    writer.close()
+    return
+
+
+def cdm_to_parquet(cdm, cdm_complete=True, extension='parquet', out_dir=None, suffix=None, prefix=None,
+                   compression='snappy', row_group_size=None, log_level='INFO'):
+    """
+    Exports a complete cdm file with multiple tables to parquet files, one per table,
+    named as the ascii files: prefix-table-suffix.parquet
+
+    Parameters
+    ----------
+    cdm:
+        common data model tables to export: a python dictionary with the {cdm_table_name: cdm_table_object}
+        pairs, as output by the mapper. The table data can be a pandas.DataFrame or an iterable of chunks.
+        It can also be an iterable of those dictionaries (e.g. the mapper output for each chunk of the
+        input data): their tables are written as new row groups to the same files.
+    cdm_complete:
+        extract the entire cdm file
+    extension:
+        default 'parquet'
+    out_dir:
+        where to stored the parquet files
+    suffix:
+        file suffix
+    prefix:
+        file prefix
+    compression:
+        parquet compression codec, default is 'snappy'
+    row_group_size:
+        maximum number of rows in each row group, defaults to the rows in each chunk
+    log_level:
+        level of logging information
+
+    Returns
+    -------
+    Saves the cdm tables as parquet files in the given directory.
+    """
+    logger = logging_hdlr.init_logger(__name__, level=log_level)
+    if pq is None:
+        logger.error('Writing parquet files requires pyarrow')
+        return
+    extension = '.' + extension
+    writers = {}
+    for cdm_i in ([cdm] if isinstance(cdm, dict) else cdm):
+        for table in cdm_i.keys():
+            if table not in writers:
+                logger.info('Writing table {}'.format(table))
+                filename = '-'.join(filter(bool, [prefix, table, suffix])) + extension
+                filepath = filename if not out_dir else os.path.join(out_dir, filename)
+                writers[table] = table_parquet_writer(cdm_i[table]['atts'], filepath, cdm_complete=cdm_complete,
+                                                      compression=compression, row_group_size=row_group_size,
+                                                      log_level=log_level)
+            data = cdm_i[table]['data']
+            for chunk in ([data] if arrow_hdlr.is_table(data) else data):
+                writers[table].write(chunk)
+    for writer in writers.values():
+        writer.close()
+    return
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exports tables written in the C3S Climate Data Store Common Data Model (CDM) format to ascii files
+partitioned in Hive style directories, see common/partitions_hdlr.py:
+
+    out_dir/year=1950/month=08/platform_type=2/prefix-table-suffix.psv
+
+The partition of each report is set from the header table, and the records of the
+observations tables go to the partition of their report (matched on report_id):
+a partition has the full records of its reports. Observations of reports not in
+the header are partitioned with their own elements (date_time for year and month).
+When the tables are given as an iterable of cdm dictionaries, the observations of each
+dictionary are matched with the header of the same dictionary.
+
+Partitions of a chunk are written concurrently, and a manifest (manifest.json)
+lists the partitions, with the files and number of records of each table.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from cdm.common import logging_hdlr
+from cdm.common import compression_hdlr
+from cdm.common import partitions_hdlr
+from cdm.common import arrow_hdlr
+from cdm.table_writer import table_writer
+
+
+def chunk_partitions(table, partition_by, report_partitions=None):
+    """
+    Gets the partition labels of the records of a table chunk
+
+    Parameters
+    ----------
+    table: pandas.DataFrame with the chunk
+    partition_by: list of partition keys
+    report_partitions: pandas.DataFrame with the partition labels of the reports, indexed by report_id
+
+    Returns
+    -------
+    pandas.DataFrame with the labels of each key
+    """
+    labels = pd.DataFrame(index=table.index, columns=partition_by, dtype=object)
+    if report_partitions is not None and 'report_id' in table:
+        labels[partition_by] = report_partitions.reindex(table['report_id'].to_numpy()).to_numpy()
+    for key in partition_by:
+        missing = labels[key].isna()
+        if missing.any():
+            own = partitions_hdlr.partition_labels(table[missing.to_numpy()], key)
+            labels.loc[missing, key] = own if own is not None else partitions_hdlr.default_partition
+    return labels
+
+
+def report_labels(header_labels):
+    """
+    Gets the partition labels of the reports, from those of the header chunks
+
+    Parameters
+    ----------
+    header_labels: list of pandas.DataFrame with the partition labels of the header chunks, indexed by report_id
+
+    Returns
+    -------
+    pandas.DataFrame with the labels of each report (the first if duplicated), None if there are no chunks
+    """
+    if not header_labels:
+        return None
+    labels = pd.concat(header_labels) if len(header_labels) > 1 else header_labels[0]
+    return labels[~labels.index.duplicated()]
+
+
+def cdm_to_partitions(cdm, partition_by=['year', 'month', 'platform_type'], out_dir='.', delimiter='|',
+                      null_label='null', cdm_complete=True, extension='psv', suffix=None, prefix=None,
+                      n_workers=None, compression=None, compression_threads=None, log_level='INFO'):
+    """
+    Exports a complete cdm file with multiple tables to ascii files partitioned in directories
+
+    Parameters
+    ----------
+    cdm:
+        common data model tables to export: a python dictionary with the {cdm_table_name: cdm_table_object}
+        pairs, as output by the mapper. The table data can be a pandas.DataFrame or an iterable of chunks.
+        It can also be an iterable of those dictionaries (e.g. the mapper output for each chunk of the
+        input data): their tables are appended to the same files.
+    partition_by:
+        list of partition keys: 'year', 'month' or table elements. Default is ['year', 'month', 'platform_type']
+    out_dir:
+        root directory of the partitions
+    delimiter:
+        default '|'
+    null_label:
+        specified how nan are represented
+    cdm_complete:
+        extract the entire cdm file
+    extension:
+        default 'psv'
+    suffix:
+        file suffix
+    prefix:
+        file prefix
+    n_workers:
+        number of processes to write the partitions concurrently.
+        Default is None, partitions are written one after the other
+    compression:
+        None (default), or compression of the files: 'gzip', 'bz2' or 'zstd'
+    compression_threads:
+        number of threads compressing each file
+    log_level:
+        level of logging information
+
+    Returns
+    -------
+    Saves the cdm tables as ascii files in the partition directories and the manifest in out_dir.
+    """
+    logger = logging_hdlr.init_logger(__name__, level=log_level)
+    if not partition_by:
+        logger.error('No partition keys (partition_by) given')
+        return
+    if compression:
+        error = compression_hdlr.check_compression(compression)
+        if error:
+            logger.error(error)
+            return
+    extension = '.' + extension + (compression_hdlr.compressions.get(compression) if compression else '')
+    writers = {}
+    failed = []
+    executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers and n_workers > 1 else None
+    try:
+        for cdm_i in ([cdm] if isinstance(cdm, dict) else cdm):
+            # The header is partitioned first: its reports set the partitions of the observations
+            header_labels = []
+            report_partitions = None
+            for table in sorted(cdm_i.keys(), key=lambda x: x != 'header'):
+                if table in failed:
+                    continue
+                logger.info('Printing table {}'.format(table))
+                data = cdm_i[table]['data']
+                try:
+                    chunks = iter([data]) if arrow_hdlr.is_table(data) else iter(data)
+                    if table != 'header' and report_partitions is None:
+                        report_partitions = report_labels(header_labels)
+                    for chunk in chunks:
+                        chunk = arrow_hdlr.to_pandas(chunk)
+                        labels = chunk_partitions(chunk, partition_by, report_partitions)
+                        if table == 'header' and 'report_id' in chunk:
+                            header_labels.append(labels.set_index(chunk['report_id'].to_numpy()))
+                        groups = labels.groupby(partition_by, sort=False).indices
+                        step = {}
+                        for keys, rows in groups.items():
+                            keys = keys if isinstance(keys, tuple) else (keys,)
+                            path = partitions_hdlr.partition_path(dict(zip(partition_by, keys)))
+                            if (table, path) not in writers:
+                                os.makedirs(os.path.join(out_dir, path), exist_ok=True)
+                                filename = '-'.join(filter(bool, [prefix, table, suffix])) + extension
+                                writers[(table, path)] = table_writer.table_ascii_writer(
+                                    cdm_i[table]['atts'], os.path.join(out_dir, path, filename),
+                                    delimiter=delimiter, null_label=null_label, cdm_complete=cdm_complete,
+                                    compression=compression, compression_threads=compression_threads,
+                                    log_level=log_level)
+                            step[path] = chunk.iloc[rows]
+                        if executor:
+                            futures = {path: executor.submit(table_writer.write_chunk, writers[(table, path)], part)
+                                       for path, part in step.items()}
+                            for path, future in futures.items():
+                                writers[(table, path)] = future.result()
+                        else:
+                            for path, part in step.items():
+                                writers[(table, path)] = table_writer.write_chunk(writers[(table, path)], part)
+                except Exception as e:
+                    logger.error('Error printing table {}'.format(table), exc_info=e)
+                    failed.append(table)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    partitions = {}
+    for (table, path), writer in writers.items():
+        if table in failed:
+            continue
+        writer.close()
+        partition = partitions.setdefault(path, {'path': path, 'keys': dict(zip(partition_by, [
+            x.split('=', 1)[1] for x in path.split(os.sep)])), 'tables': {}})
+        partition['tables'][table] = {'file': os.path.basename(writer.filename), 'rows': writer.rows}
+    partitions_hdlr.write_manifest(out_dir, {'partition_by': partition_by,
+                                             'partitions': sorted(partitions.values(), key=lambda x: x['path'])})
+    if len(failed) > 0:
+        logger.error('Tables not printed: {}'.format(",".join(failed)))
+    return
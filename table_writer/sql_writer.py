@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Loads tables written in the C3S Climate Data Store Common Data Model (CDM) format to a database.
+
+Tables are printed with the ascii table printers to PostgreSQL COPY text format
+(tab delimited, \\N for nulls, backslash escapes, arrays as {a,b}) and loaded in
+batches of rows per table:
+
+    - PostgreSQL: with COPY FROM STDIN, over a DB-API connection (psycopg2 or psycopg)
+      or a connection pool (object with getconn() and putconn(), as psycopg2.pool)
+    - SQLite: with executemany INSERT, over a sqlite3 connection. Same interface,
+      to test and benchmark the loading locally.
+
+With upsert=True, rows with a key (report_id in the header, observation_id in the
+observations tables) already in the database are updated instead of duplicated
+(ON CONFLICT DO UPDATE). In PostgreSQL the batch is copied to a temporary table
+and then inserted from there. The key needs a unique constraint in the database
+tables.
+
+Database tables are named as the CDM tables and can be created with create_tables=True.
+"""
+
+import csv
+import re
+import sqlite3
+from io import StringIO
+from cdm.common import logging_hdlr
+from cdm.common import arrow_hdlr
+from cdm.table_writer import table_writer
+
+# Element identifying the records of each table, for upserts
+sql_keys = {'header': 'report_id'}
+sql_default_key = 'observation_id'
+
+# CDM data types to database types
+sql_types = {'postgresql': {'int': 'integer', 'numeric': 'numeric', 'varchar': 'varchar',
+                            'timestamp with timezone': 'timestamp with time zone',
+                            'int[]': 'integer[]', 'numeric[]': 'numeric[]', 'varchar[]': 'varchar[]',
+                            'timestamp with timezone[]': 'timestamp with time zone[]'},
+             'sqlite': {'int': 'INTEGER', 'numeric': 'REAL', 'varchar': 'TEXT',
+                        'timestamp with timezone': 'TEXT'}}
+
+copy_null = '\\N'
+copy_escapes = [('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r')]
+# Escape sequences of COPY text format: a backslash and the escaped character
+copy_escaped = re.compile(r'\\(.)', re.DOTALL)
+copy_unescapes = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r'}
+
+
+def quote_identifier(name):
+    """
+    Quotes a database identifier (table names like observations-at need it)
+
+    Parameters
+    ----------
+    name: identifier
+
+    Returns
+    -------
+    str: quoted identifier
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_backend(connection):
+    """
+    Gets the database backend of a connection
+
+    Parameters
+    ----------
+    connection: sqlite3 connection, or PostgreSQL connection or connection pool
+
+    Returns
+    -------
+    str: 'sqlite' or 'postgresql'
+    """
+    return 'sqlite' if isinstance(connection, sqlite3.Connection) else 'postgresql'
+
+
+def create_table_sql(table_name, table_atts, backend, key=None, schema=None):
+    """
+    Gets the statement creating a database table for a CDM table
+
+    Parameters
+    ----------
+    table_name: CDM table name
+    table_atts: attributes of the table stored as a python dictionary
+    backend: 'postgresql' or 'sqlite'
+    key: element with a unique constraint
+    schema: database schema
+
+    Returns
+    -------
+    str: CREATE TABLE statement
+    """
+    types = sql_types.get(backend)
+    columns = ['{0} {1}{2}'.format(quote_identifier(x), types.get(v.get('data_type'), types.get('varchar')),
+                                   ' UNIQUE' if x == key else '') for x, v in table_atts.items()]
+    return 'CREATE TABLE IF NOT EXISTS {0} ({1})'.format(qualified_name(table_name, schema), ', '.join(columns))
+
+
+def qualified_name(table_name, schema=None):
+    """
+    Gets the quoted, schema qualified, name of a table
+
+    Parameters
+    ----------
+    table_name: table name
+    schema: database schema
+
+    Returns
+    -------
+    str: quoted name
+    """
+    return '.'.join([quote_identifier(x) for x in filter(bool, [schema, table_name])])
+
+
+class table_sql_writer(table_writer.table_ascii_writer):
+    """
+    Loads a cdm table to a database table, chunk by chunk and in batches of rows.
+
+    Chunks are printed with the ascii table printers in COPY text format and buffered
+    until batch_size rows are reached, then the batch is loaded and committed.
+
+    Parameters
+    ----------
+    table_atts: attributes of the table stored as a python dictionary.
+    table_name: name of the table in the database
+    connection: sqlite3 connection, or PostgreSQL connection or connection pool
+    schema: database schema (PostgreSQL)
+    batch_size: number of rows loaded at once
+    upsert: update the records with keys already in the table
+    key: element identifying the records, for upserts
+    cdm_complete: if we load all the elements of the table.
+        Otherwise, the elements in the first chunk written. Default is ``True``
+    log_level:
+        level of logging information to be saved
+    """
+
+    def __init__(self, table_atts, table_name, connection, schema=None, batch_size=100000, upsert=False, key=None,
+                 cdm_complete=True, log_level='INFO'):
+        super().__init__(table_atts, None, delimiter='\t', null_label=copy_null, cdm_complete=cdm_complete,
+                         log_level=log_level)
+        self.table_name = table_name
+        self.connection = connection
+        self.backend = get_backend(connection)
+        self.schema = schema
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.key = key
+        self.buffer = StringIO()
+        self.batch_rows = 0
+
+    def write(self, table):
+        """
+        Prints a chunk of the table and adds it to the batch, loading the batch if full
+
+        Parameters
+        ----------
+        table: pandas.DataFrame with the chunk to write, or a pyarrow.Table. It is not modified.
+        """
+        table = arrow_hdlr.to_pandas(table)
+        # Escape the text elements for COPY
+        text = [x for x in table.columns if x in self.table_atts and
+                self.table_atts.get(x).get('data_type') == 'varchar' and table[x].dtype == 'object']
+        escaped = {}
+        for x in text:
+            values = table[x].astype(str)
+            for a, b in copy_escapes:
+                values = values.str.replace(a, b, regex=False)
+            escaped[x] = values.where(table[x].notna(), table[x])
+        super().write(table.assign(**escaped) if escaped else table)
+
+    def to_file(self, ascii_table, columns, header, mode):
+        """
+        Adds a printed chunk to the batch, loads the batch if full
+        """
+        ascii_table.to_csv(self.buffer, index=False, sep=self.delimiter, columns=columns, header=False,
+                           quoting=csv.QUOTE_NONE)
+        self.batch_rows += len(ascii_table)
+        if self.batch_rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Loads the current batch to the database
+        """
+        if self.batch_rows == 0:
+            return
+        pool = hasattr(self.connection, 'getconn')
+        connection = self.connection.getconn() if pool else self.connection
+        try:
+            if self.backend == 'postgresql':
+                copy_postgresql(connection, self.table_name, self.columns, self.buffer, schema=self.schema,
+                                key=self.key if self.upsert else None)
+            else:
+                insert_sqlite(connection, self.table_name, self.columns, self.buffer,
+                              key=self.key if self.upsert else None)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            if pool:
+                self.connection.putconn(connection)
+        self.buffer = StringIO()
+        self.batch_rows = 0
+
+    def close(self):
+        """
+        Loads the last batch
+        """
+        if self.columns is None:
+            logger = logging_hdlr.init_logger(__name__, level=self.log_level)
+            logger.warning('No observation values in table')
+            return
+        self.flush()
+
+
+def copy_postgresql(connection, table_name, columns, buffer, schema=None, key=None):
+    """
+    Copies a buffer in COPY text format to a PostgreSQL table
+
+    Parameters
+    ----------
+    connection: DB-API connection (psycopg2 or psycopg)
+    table_name: table name
+    columns: columns in the buffer
+    buffer: io.StringIO with the rows
+    schema: database schema
+    key: if given, rows are upserted on this element
+    """
+    target = qualified_name(table_name, schema)
+    column_list = ', '.join([quote_identifier(x) for x in columns])
+    cursor = connection.cursor()
+    # Printed timestamps are UTC
+    cursor.execute("SET LOCAL TIME ZONE 'UTC'")
+    if key:
+        temporary = quote_identifier('tmp_' + table_name.replace('-', '_'))
+        cursor.execute('CREATE TEMPORARY TABLE {0} (LIKE {1} INCLUDING DEFAULTS) ON COMMIT DROP'.format(
+            temporary, target))
+        copy_target = temporary
+    else:
+        copy_target = target
+    statement = 'COPY {0} ({1}) FROM STDIN'.format(copy_target, column_list)
+    buffer.seek(0)
+    if hasattr(cursor, 'copy_expert'):
+        cursor.copy_expert(statement, buffer)
+    else:
+        with cursor.copy(statement) as copy:
+            copy.write(buffer.getvalue())
+    if key:
+        updates = ', '.join(['{0} = EXCLUDED.{0}'.format(quote_identifier(x)) for x in columns if x != key])
+        cursor.execute('INSERT INTO {0} ({1}) SELECT {1} FROM {2} ON CONFLICT ({3}) DO {4}'.format(
+            target, column_list, temporary, quote_identifier(key),
+            'UPDATE SET ' + updates if updates else 'NOTHING'))
+    cursor.close()
+
+
+def insert_sqlite(connection, table_name, columns, buffer, key=None):
+    """
+    Inserts a buffer in COPY text format to a SQLite table
+
+    Parameters
+    ----------
+    connection: sqlite3 connection
+    table_name: table name
+    columns: columns in the buffer
+    buffer: io.StringIO with the rows
+    key: if given, rows are upserted on this element
+    """
+    def value(field):
+        if field == copy_null:
+            return None
+        if '\\' in field:
+            # Single pass, so that unescaped backslashes are not read as escapes again
+            field = copy_escaped.sub(lambda x: copy_unescapes.get(x.group(1), x.group(1)), field)
+        return field
+
+    buffer.seek(0)
+    rows = ([value(x) for x in line.rstrip('\n').split('\t')] for line in buffer)
+    statement = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+        quote_identifier(table_name), ', '.join([quote_identifier(x) for x in columns]),
+        ', '.join(['?'] * len(columns)))
+    if key:
+        updates = ', '.join(['{0} = excluded.{0}'.format(quote_identifier(x)) for x in columns if x != key])
+        statement += ' ON CONFLICT ({0}) DO {1}'.format(quote_identifier(key),
+                                                       'UPDATE SET ' + updates if updates else 'NOTHING')
+    connection.executemany(statement, rows)
+
+
+def cdm_to_sql(cdm, connection, schema=None, batch_size=100000, upsert=False, create_tables=False, cdm_complete=True,
+               log_level='INFO'):
+    """
+    Loads a complete cdm file with multiple tables to a database
+
+    Parameters
+    ----------
+    cdm:
+        common data model tables to export: a python dictionary with the {cdm_table_name: cdm_table_object}
+        pairs, as output by the mapper. The table data can be a pandas.DataFrame or an iterable of chunks.
+        It can also be an iterable of those dictionaries (e.g. the mapper output for each chunk of the
+        input data).
+    connection:
+        sqlite3 connection, or PostgreSQL DB-API connection or connection pool (with getconn() and putconn())
+    schema:
+        database schema of the tables (PostgreSQL)
+    batch_size:
+        number of rows of each table loaded at once
+    upsert:
+        update the records already in the tables (report_id in the header, observation_id in
+        the observations tables), instead of adding them again
+    create_tables:
+        create the database tables if they do not exist
+    cdm_complete:
+        load all the elements of the tables
+    log_level:
+        level of logging information
+
+    Returns
+    -------
+    Loads the cdm tables to the database tables with the same names.
+    """
+    logger = logging_hdlr.init_logger(__name__, level=log_level)
+    backend = get_backend(connection)
+    writers = {}
+    for cdm_i in ([cdm] if isinstance(cdm, dict) else cdm):
+        for table in cdm_i.keys():
+            if table not in writers:
+                logger.info('Loading table {}'.format(table))
+                key = sql_keys.get(table, sql_default_key)
+                if create_tables:
+                    pool = hasattr(connection, 'getconn')
+                    iconnection = connection.getconn() if pool else connection
+                    iconnection.cursor().execute(create_table_sql(table, cdm_i[table]['atts'], backend,
+                                                                  key=key, schema=schema))
+                    iconnection.commit()
+                    if pool:
+                        connection.putconn(iconnection)
+                writers[table] = table_sql_writer(cdm_i[table]['atts'], table, connection, schema=schema,
+                                                  batch_size=batch_size, upsert=upsert, key=key,
+                                                  cdm_complete=cdm_complete, log_level=log_level)
+            data = cdm_i[table]['data']
+            for chunk in ([data] if arrow_hdlr.is_table(data) else data):
+                writers[table].write(chunk)
+    for writer in writers.values():
+        writer.close()
+    return
@@ -21,16 +21,105 @@ of the imodel, the number of decimal places used comes from a default tool defin
 """
 
 import os
+import json
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from io import StringIO
 from cdm import properties
 from cdm.common import pandas_TextParser_hdlr
 from cdm.common import logging_hdlr
+from cdm.common import arrays_hdlr
+from cdm.common import compression_hdlr
+from cdm.common import arrow_hdlr
+from cdm.common import index_hdlr
 
 module_path = os.path.dirname(os.path.abspath(__file__))
 
 
+# Maximum range of values printed with a lookup table of all the integers in it
+integer_lookup_size = 1 << 16
+two_digits = np.array(['{:02d}'.format(x) for x in range(0, 100)], dtype=object)
+
+
+def format_integer(values):
+    """
+    Formats an array of integers as str(int) does.
+
+    Values within a small range are printed from a lookup table of all the integers
+    in the range, otherwise each distinct value is printed once.
+
+    Parameters
+    ----------
+    values: np.array of int64 or uint64
+
+    Returns
+    -------
+    printed: np.array of string objects
+    """
+    if len(values) == 0:
+        return np.array([], dtype=object)
+    low = values.min()
+    high = values.max()
+    # Range as python int, it can overflow int64
+    if int(high) - int(low) < integer_lookup_size:
+        return np.arange(int(low), int(high) + 1, dtype=values.dtype).astype(str).astype(object)[
+            (values - low).astype('int64')]
+    codes, uniques = pd.factorize(values)
+    return uniques.astype(str).astype(object)[codes]
+
+
+def format_datetime(values):
+    """
+    Formats an array of datetimes as strftime("%Y-%m-%d %H:%M:%S") does.
+
+    Each distinct value is printed once, from its integer date and time components.
+    Years out of the 4 digit range are printed with strftime.
+
+    Parameters
+    ----------
+    values: np.array of datetime64[ns] (no NaT)
+
+    Returns
+    -------
+    printed: np.array of string objects
+    """
+    codes, uniques = pd.factorize(values.view('int64'))
+    seconds = uniques.view('datetime64[ns]').astype('datetime64[s]')
+    days = seconds.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    years = months.astype('datetime64[Y]').astype('int64') + 1970
+    hms = (seconds - days).astype('int64')
+    printed = (years.astype(str).astype(object) + '-' + two_digits[months.astype('int64') % 12 + 1] + '-' +
+               two_digits[(days - months).astype('int64') + 1] + ' ' + two_digits[hms // 3600] + ':' +
+               two_digits[hms // 60 % 60] + ':' + two_digits[hms % 60])
+    out_of_range = np.where((years < 1000) | (years > 9999))[0]
+    printed[out_of_range] = pd.DatetimeIndex(seconds[out_of_range]).strftime("%Y-%m-%d %H:%M:%S")
+    return printed[codes]
+
+
+def print_notna(data, printer, null_label):
+    """
+    Prints the non missing values of a series to a new series of string objects.
+    The input series is not modified.
+
+    Parameters
+    ----------
+    data: pd.Series to print
+    printer: function printing a pd.Series of non missing values
+    null_label: specified how nan are represented
+
+    Returns
+    -------
+    data: pd.Series of string objects
+    """
+    notna = data.notna().to_numpy()
+    printed = np.full(len(data), null_label, dtype=object)
+    if notna.any():
+        printed[notna] = printer(data[notna]).to_numpy()
+    return pd.Series(printed, index=data.index, dtype='object')
+
+
 def print_integer(data, null_label):
     """
     Prints all elements that have 'int' as type attribute
@@ -43,9 +132,66 @@ def print_integer(data, null_label):
     -------
     data: data as int type
     """
-    data.iloc[np.where(data.notna())] = data.iloc[np.where(data.notna())].astype(int).astype(str)
-    data.iloc[np.where(data.isna())] = null_label
-    return data
+    if data.dtype.kind not in 'iuf':
+        return print_notna(data, lambda x: x.astype(int).astype(str), null_label)
+    notna = data.notna().to_numpy()
+    printed = np.full(len(data), null_label, dtype=object)
+    printed[notna] = format_integer(data.to_numpy()[notna].astype('uint64' if data.dtype.kind == 'u' else 'int64'))
+    return pd.Series(printed, index=data.index, dtype='object')
+
+
+def format_fixed(values, decimal_places):
+    """
+    Formats an array of floats with a fixed number of decimal places, as '{:.Nf}'.format does.
+
+    Values are scaled by 10**decimal_places and rounded to integers, whose digits are written
+    in bulk to a byte buffer that is then split into the output strings. The sign is taken from
+    the sign bit, so that negative zero and negative values rounding to zero keep their '-'.
+    Values too close to a rounding tie for the scaled float to be trusted, too large for an
+    exact integer or not finite, are formatted with python for an identical output.
+
+    Parameters
+    ----------
+    values: np.array of float64
+    decimal_places: number of decimal places
+
+    Returns
+    -------
+    printed: np.array of string objects
+    """
+    format_float = '{:.' + str(decimal_places) + 'f}'
+    n = len(values)
+    with np.errstate(invalid='ignore', over='ignore'):
+        scaled = np.abs(values) * 10.0 ** decimal_places
+        exact = (scaled < 2 ** 52) & (np.abs(scaled - np.floor(scaled) - 0.5) > 4 * np.spacing(scaled))
+    rounded = np.rint(np.where(exact, scaled, 0)).astype('int64')
+    integer_part, decimal_part = np.divmod(rounded, 10 ** decimal_places)
+    negative = np.signbit(values)
+    # Right aligned digits, 0 bytes as padding: '-', integer digits, '.', decimal digits
+    integer_digits = len(str(integer_part.max())) if n > 0 else 1
+    point = 1 + integer_digits
+    width = point + (decimal_places + 1 if decimal_places > 0 else 0)
+    buffer = np.zeros((n, width), dtype=np.uint8)
+    for i in range(decimal_places):
+        buffer[:, width - 1 - i] = 48 + decimal_part % 10
+        decimal_part = decimal_part // 10
+    if decimal_places > 0:
+        buffer[:, point] = ord('.')
+    lengths = np.ones(n, dtype='int64')
+    buffer[:, point - 1] = 48 + integer_part % 10
+    for i in range(1, integer_digits):
+        integer_part = integer_part // 10
+        digit = integer_part > 0
+        lengths += digit
+        buffer[:, point - 1 - i] = np.where(digit, 48 + integer_part % 10, 0)
+    buffer[np.arange(n), point - 1 - lengths] = np.where(negative, ord('-'), 0)
+    lengths += negative + width - point
+    text = buffer[buffer > 0].tobytes().decode('ascii')
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).tolist()
+    printed = np.array([text[i:j] for i, j in zip(offsets[:-1], offsets[1:])] + [None], dtype=object)[:-1]
+    inexact = np.where(~exact)[0]
+    printed[inexact] = [format_float.format(x) for x in values[inexact]]
+    return printed
 
 
 def print_float(data, null_label, decimal_places=None):
@@ -63,9 +209,16 @@ def print_float(data, null_label, decimal_places=None):
     """
     decimal_places = properties.default_decimal_places if decimal_places is None else decimal_places
     format_float = '{:.' + str(decimal_places) + 'f}'
-    data.iloc[np.where(data.notna())] = data.iloc[np.where(data.notna())].apply(format_float.format)
-    data.iloc[np.where(data.isna())] = null_label
-    return data
+    try:
+        values = data.to_numpy(dtype='float64', na_value=np.nan)
+    except (TypeError, ValueError):
+        return print_notna(data, lambda x: x.apply(format_float.format), null_label)
+    # Format each distinct value once: factorize on the bit pattern to keep -0.0 apart from 0.0
+    notna = ~np.isnan(values)
+    codes = np.full(len(values), -1, dtype='int64')
+    codes[notna], uniques = pd.factorize(values[notna].view('int64'))
+    printed = np.append(format_fixed(uniques.view('float64'), decimal_places), null_label)
+    return pd.Series(printed[codes], index=data.index, dtype='object')
 
 
 def print_datetime(data, null_label):
@@ -80,9 +233,19 @@ def print_datetime(data, null_label):
     -------
     data: data as datetime objects
     """
-    data.iloc[np.where(data.notna())] = data.iloc[np.where(data.notna())].dt.strftime("%Y-%m-%d %H:%M:%S")
-    data.iloc[np.where(data.isna())] = null_label
-    return data
+    if data.dtype.kind != 'M' and not isinstance(data.dtype, pd.DatetimeTZDtype):
+        return print_notna(data, lambda x: x.dt.strftime("%Y-%m-%d %H:%M:%S"), null_label)
+    notna = data.notna().to_numpy()
+    printed = np.full(len(data), null_label, dtype=object)
+    if data.dt.tz is None:
+        printed[notna] = format_datetime(data.to_numpy()[notna])
+    else:
+        # Timezone aware datetimes are printed in their local time, followed by their UTC offset
+        local = data.dt.tz_localize(None).to_numpy()[notna]
+        offsets = (local - data.dt.tz_convert(None).to_numpy()[notna]).astype('timedelta64[m]').astype('int64')
+        printed[notna] = format_datetime(local) + np.where(offsets < 0, '-', '+').astype(object) + \
+            two_digits[np.abs(offsets) // 60] + ':' + two_digits[np.abs(offsets) % 60]
+    return pd.Series(printed, index=data.index, dtype='object')
 
 
 def print_varchar(data, null_label):
@@ -97,9 +260,7 @@ def print_varchar(data, null_label):
     -------
     data: data as string objects
     """
-    data.iloc[np.where(data.notna())] = data.iloc[np.where(data.notna())].astype(str)
-    data.iloc[np.where(data.isna())] = null_label
-    return data
+    return print_notna(data, lambda x: x.astype(str), null_label)
 
 
 def print_integer_array(data, null_label):
@@ -114,7 +275,7 @@ def print_integer_array(data, null_label):
     -------
     data: array of int objects
     """
-    return data.apply(print_integer_array_i, null_label=null_label)
+    return arrays_hdlr.print_array(data, print_integer_array_i, null_label)
 
 #TODO: tell this to dave and delete them... put error messages in fuctions above
 def print_float_array(data, null_label, decimal_places=None):
@@ -135,9 +296,9 @@ def print_varchar_array(data, null_label):
 
     Returns
     -------
-
+    data: array of string objects
     """
-    return data.apply(print_varchar_array_i, null_label=null_label)
+    return arrays_hdlr.print_array(data, print_varchar_array_i, null_label)
 
 
 printers = {'int': print_integer, 'numeric': print_float, 'varchar': print_varchar,
@@ -163,8 +324,7 @@ def print_integer_array_i(row, null_label=None):
 
     """
     if row == row:
-        row = eval(row)
-        row = row if isinstance(row, list) else [row]
+        row = [float(x) for x in arrays_hdlr.to_list(row)]
         string = ','.join(filter(bool, [str(int(x)) for x in row if np.isfinite(x)]))
         if len(string) > 0:
             return '{' + string + '}'
@@ -187,8 +347,7 @@ def print_varchar_array_i(row, null_label=None):
 
     """
     if row == row:
-        row = eval(row)
-        row = row if isinstance(row, list) else [row]
+        row = arrays_hdlr.to_list(row)
         string = ','.join(filter(bool, row))
         if len(string) > 0:
             return '{' + string + '}'
@@ -198,8 +357,312 @@ def print_varchar_array_i(row, null_label=None):
         return null_label
 
 
+class table_ascii_writer():
+    """
+    Writes a cdm table to an ascii file, chunk by chunk.
+
+    The header is written with the first chunk with observation values,
+    following chunks are appended. If no chunk has observation values, an
+    empty table (header only) is written when the writer is closed.
+
+    Parameters
+    ----------
+    table_atts: attributes of the table stored as a python dictionary.
+            This contains all element names, characteristics and types encoding,
+            as well as other characteristics e.g. decimal places, etc.
+    filename:
+        the name of the file to stored the data
+    delimiter:
+        default '|'
+    null_label:
+        specified how nan are represented
+    cdm_complete: if we export all the elements of the table.
+        Otherwise, the elements in the first chunk written. Default is ``True``
+    compression:
+        None (default), or compression of the file: 'gzip', 'bz2' or 'zstd'.
+        Chunks are compressed in blocks by multiple threads as they are written.
+        If not supported, the error is logged and the table is not written.
+    compression_threads:
+        number of compression threads, defaults to the number of CPUs
+    shard_rows:
+        maximum number of records in each file. If this or shard_size are set, the table is written to
+        shards (<filename root>-part0001.<extension>, ...), each with the header, and the shards are listed
+        in an index file (<filename root>-shards.json)
+    shard_size:
+        maximum size in bytes (uncompressed, approximate) of each file
+    index_by:
+        list of elements to index the records by, e.g. ['report_id']. The byte offset and length of each record
+        are written to an index sorted by the element values (<filename root>-<element>.idx.npy), see
+        common/index_hdlr.py. Only uncompressed files are indexed
+    log_level:
+        level of logging information to be saved
+
+    Usage
+    -----
+    writer = table_ascii_writer(table_atts, filename)
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+    """
+
+    def __init__(self, table_atts, filename, delimiter='|', null_label='null', cdm_complete=True, compression=None,
+                 compression_threads=None, shard_rows=None, shard_size=None, index_by=None, log_level='INFO'):
+        self.table_atts = table_atts
+        self.filename = filename
+        self.delimiter = delimiter
+        self.null_label = null_label
+        self.cdm_complete = cdm_complete
+        self.compression = compression
+        self.compression_threads = compression_threads
+        self.shard_rows = shard_rows
+        self.shard_size = shard_size
+        self.index_by = list(index_by) if index_by and not compression else []
+        self.log_level = log_level
+        if index_by and compression:
+            logger = logging_hdlr.init_logger(__name__, level=log_level)
+            logger.warning('Compressed files not indexed')
+        self.columns = None
+        self.rows = 0
+        # Shards written: [{'file', 'rows', 'bytes'}]
+        self.shards = []
+        self.shard_full = True
+        # Compression not supported: the table is not written
+        self.error = compression_hdlr.check_compression(compression) if compression else None
+        if self.error:
+            logger = logging_hdlr.init_logger(__name__, level=log_level)
+            logger.error(self.error)
+
+    def write(self, table):
+        """
+        Prints a chunk of the table and writes it to the file
+
+        Parameters
+        ----------
+        table: pandas.DataFrame with the chunk to write, or a pyarrow.Table. It is not modified.
+        """
+        if self.error:
+            return
+        logger = logging_hdlr.init_logger(__name__, level=self.log_level)
+        table = arrow_hdlr.to_pandas(table)
+        # Records with no 'observation_value' are not printed: select them with a mask, the input table is not modified
+        rows = None
+        if 'observation_value' in table:
+            rows = table['observation_value'].notna().to_numpy()
+            empty_table = True if not rows.any() else False
+            rows = None if rows.all() else rows
+        elif 'observation_value' in self.table_atts.keys():
+            empty_table = True
+        else:
+            empty_table = True if len(table) == 0 else False
+        if empty_table:
+            return
+
+        index = table.index if rows is None else table.index[rows]
+        ascii_table = pd.DataFrame(index=index, columns=self.table_atts.keys(), dtype='object')
+        for iele in self.table_atts.keys():
+            if iele in table:
+                itype = self.table_atts.get(iele).get('data_type')
+                if printers.get(itype):
+                    iprinter_kwargs = iprinters_kwargs.get(itype)
+                    if iprinter_kwargs:
+                        kwargs = {x: self.table_atts.get(iele).get(x) for x in iprinter_kwargs}
+                    else:
+                        kwargs = {}
+                    data = table[iele] if rows is None else table[iele][rows]
+                    ascii_table[iele] = printers.get(itype)(data, self.null_label, **kwargs)
+                else:
+                    logger.error('No printer defined for element {}'.format(iele))
+            else:
+                ascii_table[iele] = self.null_label
+
+        header = self.columns is None
+        wmode = 'w' if header else 'a'
+        if header:
+            self.columns = [x for x in self.table_atts.keys() if x in table.columns] if not self.cdm_complete \
+                else list(self.table_atts.keys())
+            self.index_by = [x for x in self.index_by if x in self.columns]
+            for element in self.index_by:
+                index_hdlr.remove_index(self.index_root(element))
+        self.rows += len(ascii_table)
+        self.to_file(ascii_table, columns=self.columns, header=header, mode=wmode)
+
+    def close(self):
+        """
+        Closes the table: writes an empty table if no observation values have been written
+        """
+        if self.error:
+            return
+        if self.columns is None:
+            logger = logging_hdlr.init_logger(__name__, level=self.log_level)
+            logger.warning('No observation values in table')
+            ascii_table = pd.DataFrame(columns=self.table_atts.keys(), dtype='object')
+            self.columns = list(self.table_atts.keys())
+            self.to_file(ascii_table, columns=self.columns, header=True, mode='w')
+        if self.sharded():
+            with open(shard_index_filename(self.filename, self.compression), 'w') as fileObj:
+                json.dump({'rows': self.rows, 'shards': self.shards}, fileObj, indent=2)
+        for element in self.index_by:
+            index_hdlr.write_index(self.index_root(element), element)
+
+    def sharded(self):
+        return bool(self.shard_rows or self.shard_size)
+
+    def index_root(self, element):
+        return index_hdlr.index_root(shard_root(self.filename, self.compression)[0], element)
+
+    def to_file(self, ascii_table, columns, header, mode):
+        """
+        Writes a printed table to the file, compressed if requested
+
+        Parameters
+        ----------
+        ascii_table: pandas.DataFrame with the printed table
+        columns: columns to write
+        header: whether to write the header
+        mode: 'w' or 'a'
+        """
+        if self.sharded():
+            self.to_shards(ascii_table, columns)
+            return
+        self.to_filename(self.filename, ascii_table, columns, header, mode)
+
+    def to_filename(self, filename, ascii_table, columns, header, mode):
+        if self.index_by:
+            self.to_indexed(filename, ascii_table, columns, header, mode)
+            return
+        if not self.compression:
+            ascii_table.to_csv(filename, index=False, sep=self.delimiter, columns=columns, header=header,
+                               mode=mode)
+            return
+        with compression_hdlr.block_compressor(filename, self.compression, mode=mode,
+                                               threads=self.compression_threads) as stream:
+            ascii_table.to_csv(stream, index=False, sep=self.delimiter, columns=columns, header=header)
+
+    def to_indexed(self, filename, ascii_table, columns, header, mode):
+        """
+        Writes a printed table to an uncompressed file, adding its records to the indexes
+        """
+        data = ascii_table.to_csv(None, index=False, sep=self.delimiter, columns=columns,
+                                  header=header).encode('utf-8')
+        offset = os.path.getsize(filename) if mode == 'a' and os.path.isfile(filename) else 0
+        with open(filename, 'wb' if mode == 'w' else 'ab') as fileObj:
+            fileObj.write(data)
+        start = data.index(b'\n') + 1 if header else 0
+        lengths = index_hdlr.record_lengths(data[start:], len(ascii_table))
+        if lengths is None:
+            logger = logging_hdlr.init_logger(__name__, level=self.log_level)
+            logger.warning('Records in multiple lines, file {} not indexed'.format(filename))
+            for element in self.index_by:
+                index_hdlr.remove_index(self.index_root(element))
+            self.index_by = []
+            return
+        offsets = offset + start + np.cumsum(lengths) - lengths
+        for element in self.index_by:
+            keys = ascii_table[element].to_numpy()
+            rows = keys != self.null_label
+            index_hdlr.append_entries(self.index_root(element), keys[rows], os.path.basename(filename),
+                                      offsets[rows], lengths[rows])
+
+    def to_shards(self, ascii_table, columns):
+        """
+        Writes a printed table to the shards, opening a new shard when the current one is full
+        """
+        # Approximate size of each printed record: its values, delimiters and new line
+        sizes = np.full(len(ascii_table), len(columns), dtype='int64')
+        for column in columns:
+            sizes += ascii_table[column].str.len().to_numpy(dtype='int64')
+        start = 0
+        while True:
+            if self.shard_full:
+                filename = shard_filename(self.filename, len(self.shards) + 1, self.compression)
+                self.to_filename(filename, ascii_table.iloc[0:0], columns, True, 'w')
+                self.shards.append({'file': os.path.basename(filename), 'rows': 0,
+                                    'bytes': len(self.delimiter.join(columns)) + 1})
+                self.shard_full = False
+            shard = self.shards[-1]
+            end = len(ascii_table)
+            if self.shard_rows:
+                end = min(end, start + self.shard_rows - shard.get('rows'))
+            if self.shard_size:
+                fits = np.searchsorted(np.cumsum(sizes[start:end]), self.shard_size - shard.get('bytes'), side='right')
+                # A shard has at least one record
+                end = min(end, start + int(max(fits, 1 if shard.get('rows') == 0 else 0)))
+            if end > start:
+                shard['bytes'] += int(sizes[start:end].sum())
+                self.to_filename(filename_of(self.filename, shard.get('file')), ascii_table.iloc[start:end],
+                                 columns, False, 'a')
+                shard['rows'] += end - start
+            if end < len(ascii_table):
+                self.shard_full = True
+                start = end
+                continue
+            self.shard_full = bool((self.shard_rows and shard.get('rows') >= self.shard_rows) or
+                                   (self.shard_size and shard.get('bytes') >= self.shard_size))
+            break
+
+
+def filename_of(filename, basename):
+    """
+    Gets the path of a file in the directory of another
+    """
+    return os.path.join(os.path.dirname(filename), basename)
+
+
+def shard_root(filename, compression=None):
+    """
+    Splits a file name in its root and extension (with the compression extension, if any)
+    """
+    root, extension = os.path.splitext(filename)
+    if compression:
+        root, table_extension = os.path.splitext(root)
+        extension = table_extension + extension
+    return root, extension
+
+
+def shard_filename(filename, shard, compression=None):
+    """
+    Gets the name of a shard of a file: <root>-part0001.<extension>
+
+    Parameters
+    ----------
+    filename: name of the file
+    shard: shard number, from 1
+    compression: compression of the file, if any
+
+    Returns
+    -------
+    str: shard file name
+    """
+    root, extension = shard_root(filename, compression)
+    return '{0}-part{1:04d}{2}'.format(root, shard, extension)
+
+
+def shard_index_filename(filename, compression=None):
+    """
+    Gets the name of the shard index of a file: <root>-shards.json
+    """
+    return shard_root(filename, compression)[0] + '-shards.json'
+
+
+def write_chunk(writer, chunk):
+    """
+    Writes a chunk of a table with its writer
+
+    Parameters
+    ----------
+    writer: table_ascii_writer
+    chunk: pandas.DataFrame with the chunk to write
+
+    Returns
+    -------
+    writer: the table_ascii_writer, with its state after the chunk is written
+    """
+    writer.write(chunk)
+    return writer
+
+
 def table_to_ascii(table, table_atts, delimiter='|', null_label='null', cdm_complete=True, filename=None,
-                   full_table=True, log_level='INFO'):
+                   full_table=True, compression=None, compression_threads=None, log_level='INFO'):
     """
     Exports a cdm table to an ascii file.
     Exports tables written in the C3S Climate Data Store Common Data Model (CDM) format to ascii files.
@@ -209,7 +672,8 @@ def table_to_ascii(table, table_atts, delimiter='|', null_label='null', cdm_comp
     Parameters
     ----------
     table:
-        pandas.Dataframe to export
+        pandas.Dataframe to export, or an iterable of pandas.DataFrame chunks
+        (e.g. ``pd.io.parsers.TextFileReader``) that are written one after the other
     table_atts: attributes of the pandas.Dataframe stored as a python dictionary.
             This contains all element names, characteristics and types encoding,
             as well as other characteristics e.g. decimal places, etc.
@@ -223,6 +687,10 @@ def table_to_ascii(table, table_atts, delimiter='|', null_label='null', cdm_comp
         the name of the file to stored the data
     full_table:
         if we export a single table
+    compression:
+        None (default), or compression of the file: 'gzip', 'bz2' or 'zstd'
+    compression_threads:
+        number of compression threads, defaults to the number of CPUs
     log_level:
         level of logging information to be saved
 
@@ -230,91 +698,20 @@ def table_to_ascii(table, table_atts, delimiter='|', null_label='null', cdm_comp
     -------
     Saves cdm tables as ascii files
     """
-    logger = logging_hdlr.init_logger(__name__, level=log_level)
-
-    empty_table = False
-    if 'observation_value' in table:
-        table.dropna(subset=['observation_value'], inplace=True)
-        empty_table = True if len(table) == 0 else False
-    elif 'observation_value' in table_atts.keys():
-        empty_table = True
-    else:
-        empty_table = True if len(table) == 0 else False
-    if empty_table:
-        logger.warning('No observation values in table')
-        ascii_table = pd.DataFrame(columns=table_atts.keys(), dtype='object')
-        ascii_table.to_csv(filename, index=False, sep=delimiter, header=True, mode='w')
+    writer = table_ascii_writer(table_atts, filename, delimiter=delimiter, null_label=null_label,
+                                cdm_complete=cdm_complete, compression=compression,
+                                compression_threads=compression_threads, log_level=log_level)
+    if writer.error:
         return
-
-    ascii_table = pd.DataFrame(index=table.index, columns=table_atts.keys(), dtype='object')
-    for iele in table_atts.keys():
-        if iele in table:
-            itype = table_atts.get(iele).get('data_type')
-            if printers.get(itype):
-                iprinter_kwargs = iprinters_kwargs.get(itype)
-                if iprinter_kwargs:
-                    kwargs = {x: table_atts.get(iele).get(x) for x in iprinter_kwargs}
-                else:
-                    kwargs = {}
-                ascii_table[iele] = printers.get(itype)(table[iele], null_label, **kwargs)
-            else:
-                logger.error('No printer defined for element {}'.format(iele))
-        else:
-            ascii_table[iele] = null_label
-
-    header = True
-    wmode = 'w'
-    columns_to_ascii = [x for x in table_atts.keys() if x in table.columns] if not cdm_complete else table_atts.keys()
-    ascii_table.to_csv(filename, index=False, sep=delimiter, columns=columns_to_ascii, header=header, mode=wmode)
-
-    #    # Convert to iterable if plain dataframe
-    #    # This is no longer needed as the mapper now only produces real dataframes,
-    #    # never TextParser...
-    #    if isinstance(table,pd.DataFrame):
-    #        table = [table]
-    #    ichunk = 0
-    #    for itable in table:
-    #        # drop records with no 'observation_value'
-    #        empty_table = False
-    #        if 'observation_value' in itable:
-    #            itable.dropna(subset=['observation_value'],inplace=True)
-    #            empty_table = True if len(itable) == 0 else False
-    #        elif 'observation_value' in table_atts.keys():
-    #            empty_table = True
-    #        if empty_table:
-    #            logger.warning('No observation values in table')
-    #            ascii_table = pd.DataFrame(columns = table_atts.keys(), dtype = 'object')
-    #            ascii_table.to_csv(filename, index = False, sep = delimiter, header = True, mode = 'w')
-    #            break
-    #        ascii_table = pd.DataFrame(index = itable.index, columns = table_atts.keys(), dtype = 'object')
-    #        for iele in table_atts.keys():
-    #            if iele in itable:
-    #                itype = table_atts.get(iele).get('data_type')
-    #                if printers.get(itype):
-    #                    iprinter_kwargs = iprinters_kwargs.get(itype)
-    #                    if iprinter_kwargs:
-    #                        kwargs = { x:table_atts.get(iele).get(x) for x in iprinter_kwargs}
-    #                    else:
-    #                        kwargs = {}
-    #                    ascii_table[iele] = printers.get(itype)(itable[iele], null_label, **kwargs)
-    #                else:
-    #                    logger.error('No printer defined for element {}'.format(iele))
-    #            else:
-    #                ascii_table[iele] = null_label
-    #
-    #        header = False if ichunk > 0 else True
-    #        wmode = 'a' if ichunk > 0 else 'w'
-    #        columns_to_ascii = [ x for x in table_atts.keys() if x in itable.columns ]
-    #        if not cdm_complete else table_atts.keys()
-    #        ascii_table.to_csv(filename, index = False, sep = delimiter,
-    #        columns = columns_to_ascii, header = header, mode = wmode)
-    #        ichunk += 1
-
+    for chunk in ([table] if arrow_hdlr.is_table(table) else table):
+        writer.write(chunk)
+    writer.close()
     return
 
 
 def cdm_to_ascii(cdm, delimiter='|', null_label='null', cdm_complete=True, extension='psv', out_dir=None, suffix=None,
-                 prefix=None, log_level='INFO'):
+                 prefix=None, n_workers=None, compression=None, compression_threads=None, shard_rows=None,
+                 shard_size=None, index_by=None, log_level='INFO'):
     """
     Exports a complete cdm file with multiple tables to an ascii file.
     Exports a complete cdm file with multiple tables written in the C3S Climate Data Store Common Data Model (CDM)
@@ -325,7 +722,10 @@ def cdm_to_ascii(cdm, delimiter='|', null_label='null', cdm_complete=True, exten
     Parameters
     ----------
     cdm:
-        common data model tables to export
+        common data model tables to export: a python dictionary with the {cdm_table_name: cdm_table_object}
+        pairs, as output by the mapper. The table data can be a pandas.DataFrame or an iterable of chunks.
+        It can also be an iterable of those dictionaries (e.g. the mapper output for each chunk of the
+        input data): their tables are appended to the same files.
     delimiter:
         default '|'
     null_label:
@@ -340,6 +740,24 @@ def cdm_to_ascii(cdm, delimiter='|', null_label='null', cdm_complete=True, exten
         file suffix
     prefix:
         file prefix
+    n_workers:
+        number of processes to print and write the tables concurrently.
+        Default is None, tables are written one after the other
+    compression:
+        None (default), or compression of the files: 'gzip', 'bz2' or 'zstd'.
+        The compression extension is added to the file names, e.g. '.psv.gz'
+    compression_threads:
+        number of threads compressing each file, defaults to the number of CPUs
+    shard_rows:
+        maximum number of records in each file. If this or shard_size are set, each table is written to
+        shards of up to this size: prefix-table-suffix-part0001.psv, ... Each shard has the header, and the
+        shards of a table are listed in an index file, prefix-table-suffix-shards.json
+    shard_size:
+        maximum size in bytes of each file (uncompressed, approximate)
+    index_by:
+        list of elements to index the records of the tables with them by, e.g. ['report_id']: the byte offset of
+        each record is written to an index sorted by the element values, prefix-table-suffix-report_id.idx.npy,
+        to read single records with table_reader.read_reports. Only uncompressed files are indexed
     log_level:
         level of logging information
 
@@ -348,13 +766,75 @@ def cdm_to_ascii(cdm, delimiter='|', null_label='null', cdm_complete=True, exten
     Saves the cdm tables as ascii files in the given directory with a psv extension.
     """
     logger = logging_hdlr.init_logger(__name__, level=log_level)
-    # Because how the printers are written, they modify the original data frame!,
-    # also removing rows with empty observation_value in observation_tables
-    extension = '.' + extension
-    for table in cdm.keys():
-        logger.info('Printing table {}'.format(table))
-        filename = '-'.join(filter(bool, [prefix, table, suffix])) + extension
-        filepath = filename if not out_dir else os.path.join(out_dir, filename)
-        table_to_ascii(cdm[table]['data'], cdm[table]['atts'], delimiter=delimiter, null_label=null_label,
-                       cdm_complete=cdm_complete, filename=filepath, log_level=log_level)
+    # The printers do not modify the cdm tables: they can be exported again, in this or other formats
+    if compression:
+        error = compression_hdlr.check_compression(compression)
+        if error:
+            logger.error(error)
+            return
+    extension = '.' + extension + (compression_hdlr.compressions.get(compression) if compression else '')
+    writers = {}
+    failed = []
+    executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers and n_workers > 1 else None
+    try:
+        for cdm_i in ([cdm] if isinstance(cdm, dict) else cdm):
+            chunks = {}
+            for table in cdm_i.keys():
+                if table in failed:
+                    continue
+                if table not in writers:
+                    logger.info('Printing table {}'.format(table))
+                    filename = '-'.join(filter(bool, [prefix, table, suffix])) + extension
+                    filepath = filename if not out_dir else os.path.join(out_dir, filename)
+                    writers[table] = table_ascii_writer(cdm_i[table]['atts'], filepath, delimiter=delimiter,
+                                                        null_label=null_label, cdm_complete=cdm_complete,
+                                                        compression=compression,
+                                                        compression_threads=compression_threads,
+                                                        shard_rows=shard_rows, shard_size=shard_size,
+                                                        index_by=index_by, log_level=log_level)
+                data = cdm_i[table]['data']
+                try:
+                    chunks[table] = iter([data]) if arrow_hdlr.is_table(data) else iter(data)
+                except TypeError:
+                    logger.error('Table {} data is not a pandas.DataFrame or an iterable of them'.format(table))
+                    failed.append(table)
+            # Tables are written concurrently, a chunk of each table at a time
+            while chunks:
+                step = {}
+                results = {}
+                for table, ichunks in chunks.items():
+                    try:
+                        step[table] = next(ichunks)
+                    except StopIteration:
+                        pass
+                    except Exception as e:
+                        results[table] = e
+                chunks = {table: chunks.get(table) for table in list(step.keys()) + list(results.keys())}
+                if executor:
+                    futures = {table: executor.submit(write_chunk, writers[table], chunk)
+                               for table, chunk in step.items()}
+                    results.update({table: futures[table].exception() or futures[table].result()
+                                    for table in futures.keys()})
+                else:
+                    for table, chunk in step.items():
+                        try:
+                            results[table] = write_chunk(writers[table], chunk)
+                        except Exception as e:
+                            results[table] = e
+                for table, result in results.items():
+                    if isinstance(result, Exception):
+                        logger.error('Error printing table {}'.format(table), exc_info=result)
+                        failed.append(table)
+                        chunks.pop(table)
+                    else:
+                        writers[table] = result
+    finally:
+        if executor:
+            executor.shutdown()
+
+    for table, writer in writers.items():
+        if table not in failed:
+            writer.close()
+    if len(failed) > 0:
+        logger.error('Tables not printed: {}'.format(",".join(failed)))
     return
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Round trip of text elements through the SQLite loader (COPY text escapes)
+"""
+
+import sqlite3
+import pandas as pd
+from cdm.lib.tables import tables_hdlr
+from cdm.table_writer import sql_writer
+
+
+def test_sqlite_round_trip_escapes():
+    names = ['C:\\temp', 'x\\ny', 'tab\there', 'new\nline', 'cr\rhere', 'back\\\\slash', '\\N', 'plain']
+    data = pd.DataFrame({'report_id': ['R{}'.format(i) for i in range(len(names))], 'station_name': names})
+    cdm = {'header': {'data': data, 'atts': tables_hdlr.load_tables().get('header')}}
+    connection = sqlite3.connect(':memory:')
+    sql_writer.cdm_to_sql(cdm, connection, create_tables=True, log_level='ERROR')
+    rows = connection.execute('SELECT report_id, station_name FROM header ORDER BY report_id').fetchall()
+    assert dict(rows) == dict(zip(data['report_id'], names))